@@ -0,0 +1,320 @@
+import datetime
+import json
+import os
+import numpy as np
+import openpyxl
+from attendanceManager import AttendanceManager
+from exporter import json_default
+from log_config import logger
+from parse import iter_punches
+from utils import get_employee_name
+
+# 统计的百分位
+PERCENTILES = (10, 25, 50, 75, 90)
+# 直方图：起止时间（秒）与分箱宽度
+HISTOGRAM_BIN_SECONDS = 15 * 60
+ARRIVAL_RANGE = (6 * 3600, 11 * 3600)
+DEPARTURE_RANGE = (16 * 3600, 23 * 3600)
+# 与 handle_workday 相同的时间界限（当天的秒数）
+AM_WORK_START = 8 * 3600 + 30 * 60
+FLEXIBLE_SECONDS = 30 * 60
+MIDDLE_START = 12 * 3600 + 10 * 60
+MIDDLE_END = 13 * 3600 + 40 * 60
+PM_WORK_END = 18 * 3600
+OVERTIME_SECONDS = 45 * 60
+EAT_SECONDS = 30 * 60
+
+SITE = "全部"
+
+
+def load_punch_arrays(files, year, months, threshold_minutes=3):
+    """
+    读取所有员工的打卡，按员工、时间排序并去重后合并为扁平数组。
+
+    去重与 filter_times 相同：同一天内与下一次打卡间隔不超过阈值的打卡被后一次替代，
+    即每组连续相近的打卡只保留最后一次。
+
+    返回：
+    tuple: (employees, teams, emp_index, seconds)，emp_index 为每次打卡的员工序号，
+           seconds 为打卡时间（自 1970 年起的秒数），两者按 (员工, 时间) 排序
+    """
+    prefixes = tuple(f"{year:04d}-{month:02d}-" for month in months)
+    employees, teams, emp_parts, time_parts = [], [], [], []
+    for file_path in files:
+        punches = [p for p in iter_punches(file_path) if p.startswith(prefixes)]
+        times = np.sort(np.array(punches, dtype="datetime64[s]").astype(np.int64))
+        emp_parts.append(np.full(len(times), len(employees), dtype=np.int32))
+        time_parts.append(times)
+        employees.append(get_employee_name(file_path))
+        teams.append(os.path.basename(os.path.dirname(os.path.abspath(file_path))))
+
+    emp_index = np.concatenate(emp_parts) if emp_parts else np.zeros(0, dtype=np.int32)
+    seconds = np.concatenate(time_parts) if time_parts else np.zeros(0, dtype=np.int64)
+
+    # 与下一次打卡属于同一员工同一天且间隔不超过阈值的丢弃
+    day = seconds // 86400
+    keep = np.ones(len(seconds), dtype=bool)
+    keep[:-1] = ~((emp_index[1:] == emp_index[:-1]) & (day[1:] == day[:-1])
+                  & (seconds[1:] - seconds[:-1] <= threshold_minutes * 60))
+    return employees, teams, emp_index[keep], seconds[keep]
+
+
+def _hour_difference(seconds):
+    """calculate_hour_difference 的向量化版本（计算方式相同，边界结果一致）"""
+    hours_diff = seconds / 3600
+    full_hours = np.trunc(hours_diff)
+    minutes_diff = (hours_diff - full_hours) * 60
+    return np.where(minutes_diff >= 45, full_hours + 1.0, np.where(minutes_diff >= 15, full_hours + 0.5, full_hours))
+
+
+def build_day_table(year, emp_index, seconds, is_flexible=True):
+    """
+    把打卡数组汇总为按 (员工, 日期) 一行的日表，全部为向量化运算。
+
+    返回：
+    dict: 各列为等长数组：emp、day（1970 年起的天数）、month、workday、count、
+          arrival/departure（当天秒数）、lunch（午间两次打卡的间隔秒数，无则 NaN）、overtime（小时）
+    """
+    day = seconds // 86400
+    time_of_day = seconds - day * 86400
+
+    # 每个 (员工, 日期) 在排序数组中是连续的一段
+    boundary = np.ones(len(seconds), dtype=bool)
+    boundary[1:] = (emp_index[1:] != emp_index[:-1]) | (day[1:] != day[:-1])
+    starts = np.flatnonzero(boundary)
+    ends = np.r_[starts[1:], len(seconds)] - 1
+    counts = ends - starts + 1
+    days = day[starts]
+    arrival = time_of_day[starts]
+    departure = time_of_day[ends]
+
+    # 日期类型只对出现过的日期判断一次
+    unique_days, day_slot = np.unique(days, return_inverse=True)
+    day_check = AttendanceManager(year).day_check
+    epoch = datetime.date(1970, 1, 1)
+    calendar_dates = [epoch + datetime.timedelta(days=int(d)) for d in unique_days]
+    day_types = np.array([day_check.get_day_type(d) for d in calendar_dates] or [""], dtype=object)[day_slot]
+    months = np.array([d.month for d in calendar_dates] or [0], dtype=np.int16)[day_slot]
+    workday = day_types == "workday"
+
+    # 午间 [12:10, 13:40] 恰好两次打卡时的间隔
+    middle = (time_of_day >= MIDDLE_START) & (time_of_day <= MIDDLE_END)
+    group = np.repeat(np.arange(len(starts)), counts)
+    middle_count = np.bincount(group[middle], minlength=len(starts))
+    middle_first = np.full(len(starts), np.inf)
+    middle_last = np.full(len(starts), -np.inf)
+    np.minimum.at(middle_first, group[middle], time_of_day[middle])
+    np.maximum.at(middle_last, group[middle], time_of_day[middle])
+    lunch = np.where(middle_count == 2, middle_last - middle_first, np.nan)
+
+    # 工作日加班：最后一次打卡晚于 18:00+弹性顺延+45 分钟，从 18:00+顺延+30 分钟起算
+    extension = np.zeros(len(starts))
+    if is_flexible:
+        in_flexible = (arrival > AM_WORK_START) & (arrival <= AM_WORK_START + FLEXIBLE_SECONDS)
+        extension = np.where(in_flexible, arrival - AM_WORK_START, 0)
+    workday_overtime = np.where(departure >= PM_WORK_END + extension + OVERTIME_SECONDS,
+                                _hour_difference(departure - (PM_WORK_END + extension + EAT_SECONDS)), 0.0)
+    # 非工作日：恰好两次打卡时按两次打卡的间隔计算
+    nonworkday_overtime = np.where(counts == 2, _hour_difference(departure - arrival), 0.0)
+    known = (day_types == "restday") | (day_types == "holiday")
+    overtime = np.where(workday, workday_overtime, np.where(known, nonworkday_overtime, 0.0))
+
+    return {
+        "emp": emp_index[starts], "day": days, "month": months, "workday": workday, "count": counts,
+        "arrival": arrival.astype(float), "departure": departure.astype(float), "lunch": lunch,
+        "overtime": overtime,
+    }
+
+
+def group_percentiles(values, groups, n_groups, percentiles=PERCENTILES):
+    """
+    一次计算所有分组的百分位（线性插值，与 np.percentile 默认方式相同），忽略 NaN。
+
+    返回：
+    tuple: (counts, means, table)，table 形状为 (n_groups, len(percentiles))，空组为 NaN
+    """
+    valid = ~np.isnan(values)
+    values, groups = values[valid], groups[valid]
+    order = np.lexsort((values, groups))
+    values, groups = values[order], groups[order]
+
+    counts = np.bincount(groups, minlength=n_groups)
+    sums = np.bincount(groups, weights=values, minlength=n_groups)
+    starts = np.cumsum(counts) - counts
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = sums / counts
+
+    position = starts[:, None] + np.array(percentiles) / 100 * np.maximum(counts - 1, 0)[:, None]
+    lower = np.floor(position).astype(np.int64)
+    upper = np.minimum(lower + 1, starts[:, None] + np.maximum(counts - 1, 0)[:, None])
+    fraction = position - lower
+    if len(values):
+        lower_values = values[np.clip(lower, 0, len(values) - 1)]
+        upper_values = values[np.clip(upper, 0, len(values) - 1)]
+        table = lower_values + (upper_values - lower_values) * fraction
+    else:
+        table = np.full(position.shape, np.nan)
+    table[counts == 0] = np.nan
+    return counts, means, table
+
+
+def group_histogram(values, groups, n_groups, value_range, bin_seconds=HISTOGRAM_BIN_SECONDS):
+    """按分组统计直方图，超出范围的值计入首尾分箱，返回形状为 (n_groups, 分箱数) 的计数"""
+    n_bins = (value_range[1] - value_range[0]) // bin_seconds
+    valid = ~np.isnan(values)
+    bins = np.clip((values[valid] - value_range[0]) // bin_seconds, 0, n_bins - 1).astype(np.int64)
+    flat = np.bincount(groups[valid] * n_bins + bins, minlength=n_groups * n_bins)
+    return flat.reshape(n_groups, n_bins)
+
+
+def _format_seconds(seconds):
+    if seconds is None or np.isnan(seconds):
+        return None
+    seconds = int(round(seconds))
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}"
+
+
+def compute_analytics(employees, teams, table, months):
+    """
+    计算员工、组及全体的分布统计、直方图和按月趋势。
+
+    返回：
+    dict: {"groups": [...], "percentiles": {...}, "histograms": {...}, "trend": {...}}
+    """
+    # 分组：每名员工、每个组、全体；每个日表行同时属于三个分组
+    team_names = sorted(set(teams))
+    group_names = ([f"{team}/{employee}" for team, employee in zip(teams, employees)]
+                   + [f"{team}/" for team in team_names] + [SITE])
+    team_of_employee = np.array([team_names.index(team) for team in teams] or [0], dtype=np.int64)
+    n_employees, n_groups = len(employees), len(group_names)
+
+    emp = table["emp"].astype(np.int64)
+    row_groups = [emp, n_employees + team_of_employee[emp], np.full(len(emp), n_groups - 1)]
+
+    def stacked(values):
+        """把值复制三份，分别归入员工、组、全体"""
+        return np.concatenate([values] * 3), np.concatenate(row_groups)
+
+    workday = table["workday"]
+    metrics = {
+        "arrival": np.where(workday, table["arrival"], np.nan),
+        "departure": np.where(workday & (table["count"] >= 2), table["departure"], np.nan),
+        "lunch": table["lunch"] / 60,  # 分钟
+        "overtime": np.where(table["overtime"] > 0, table["overtime"], np.nan),  # 有加班的日期
+    }
+
+    percentiles = {}
+    for name, values in metrics.items():
+        counts, means, result = group_percentiles(*stacked(values), n_groups)
+        percentiles[name] = {"counts": counts, "means": means, "values": result}
+
+    histograms = {}
+    for name, value_range in (("arrival", ARRIVAL_RANGE), ("departure", DEPARTURE_RANGE)):
+        histograms[name] = {
+            "bins": [_format_seconds(s) for s in range(value_range[0], value_range[1], HISTOGRAM_BIN_SECONDS)],
+            "counts": group_histogram(*stacked(metrics[name]), n_groups, value_range),
+        }
+
+    # 按月趋势：分组 × 月份
+    month_slot = np.searchsorted(np.array(months), table["month"])
+    trend = {"months": list(months)}
+    for name, values in (("arrival", metrics["arrival"]), ("departure", metrics["departure"])):
+        values, groups = stacked(values)
+        keys = groups * len(months) + np.concatenate([month_slot] * 3)
+        valid = ~np.isnan(values)
+        counts = np.bincount(keys[valid], minlength=n_groups * len(months))
+        sums = np.bincount(keys[valid], weights=values[valid], minlength=n_groups * len(months))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            trend[name] = (sums / counts).reshape(n_groups, len(months))
+    overtime, groups = stacked(table["overtime"])
+    keys = groups * len(months) + np.concatenate([month_slot] * 3)
+    trend["overtime"] = np.bincount(keys, weights=overtime, minlength=n_groups * len(months)).reshape(n_groups, len(months))
+
+    return {"groups": group_names, "percentiles": percentiles, "histograms": histograms, "trend": trend}
+
+
+def _metric_value(name, value):
+    """时间类指标显示为 HH:MM，其他保留两位小数"""
+    if name in ("arrival", "departure"):
+        return _format_seconds(value)
+    return None if np.isnan(value) else round(float(value), 2)
+
+
+def analytics_to_dict(analytics):
+    """转换为可直接写出 JSON 的结构：{分组: {指标: {...}}}"""
+    result = {}
+    trend = analytics["trend"]
+    for i, group in enumerate(analytics["groups"]):
+        entry = {}
+        for name, data in analytics["percentiles"].items():
+            entry[name] = {
+                "count": int(data["counts"][i]),
+                "mean": _metric_value(name, data["means"][i]),
+                **{f"p{p}": _metric_value(name, v) for p, v in zip(PERCENTILES, data["values"][i])},
+            }
+        entry["histogram"] = {name: dict(zip(h["bins"], h["counts"][i].tolist()))
+                              for name, h in analytics["histograms"].items()}
+        entry["trend"] = {
+            str(month): {
+                "arrival": _metric_value("arrival", trend["arrival"][i][j]),
+                "departure": _metric_value("departure", trend["departure"][i][j]),
+                "overtime": round(float(trend["overtime"][i][j]), 2),
+            }
+            for j, month in enumerate(trend["months"])
+        }
+        result[group] = entry
+    return result
+
+
+def write_analytics_excel(wb, analytics):
+    """写出 percentiles、histogram、trend 三张表；直方图与趋势只列组和全体，员工明细见 JSON"""
+    if 'Sheet' in wb.sheetnames:
+        del wb['Sheet']
+    names = {"arrival": "上班", "departure": "下班", "lunch": "午休(分钟)", "overtime": "加班(小时)"}
+
+    ws = wb.create_sheet(title="percentiles")
+    ws.append(["分组", "指标", "天数", "平均"] + [f"P{p}" for p in PERCENTILES])
+    for i, group in enumerate(analytics["groups"]):
+        for name, data in analytics["percentiles"].items():
+            ws.append([group, names[name], int(data["counts"][i]), _metric_value(name, data["means"][i])]
+                      + [_metric_value(name, v) for v in data["values"][i]])
+
+    summary_groups = [(i, g) for i, g in enumerate(analytics["groups"]) if g.endswith("/") or g == SITE]
+
+    ws = wb.create_sheet(title="histogram")
+    for name, histogram in analytics["histograms"].items():
+        ws.append([names[name]] + histogram["bins"])
+        for i, group in summary_groups:
+            ws.append([group] + histogram["counts"][i].tolist())
+        ws.append([])
+
+    ws = wb.create_sheet(title="trend")
+    trend = analytics["trend"]
+    ws.append(["分组", "月份", "平均上班", "平均下班", "加班(小时)"])
+    for i, group in summary_groups:
+        for j, month in enumerate(trend["months"]):
+            ws.append([group, month, _metric_value("arrival", trend["arrival"][i][j]),
+                       _metric_value("departure", trend["departure"][i][j]), round(float(trend["overtime"][i][j]), 2)])
+
+
+def run_analytics(files, year, months, threshold_minutes, output_dir, is_flexible=True):
+    """读取全部考勤文件，计算分布统计，写出 analytics.xlsx 与 analytics.json"""
+    employees, teams, emp_index, seconds = load_punch_arrays(files, year, months, threshold_minutes)
+    table = build_day_table(year, emp_index, seconds, is_flexible)
+    analytics = compute_analytics(employees, teams, table, months)
+    logger.info(f"分布统计: 员工 {len(employees)} 人, 打卡 {len(seconds)} 次, {len(table['day'])} 个出勤日")
+
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    json_file = os.path.join(output_dir, "analytics.json")
+    with open(json_file, 'w', encoding='utf-8') as file:
+        json.dump(analytics_to_dict(analytics), file, ensure_ascii=False, indent=1, default=json_default)
+    logger.info(f"数据已保存为：{json_file}")
+
+    wb = openpyxl.Workbook()
+    write_analytics_excel(wb, analytics)
+    excel_file = os.path.join(output_dir, "analytics.xlsx")
+    wb.save(excel_file)
+    logger.info(f"数据已保存为：{excel_file}")
+    return analytics
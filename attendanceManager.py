@@ -1,9 +1,10 @@
 import datetime
 from daycheck import DayCheck
 import traceback
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import PatternFill
+from openpyxl.utils import get_column_letter
 import calendar
-from log_config import logger
 
 def calculate_hour_difference(start: datetime.datetime, end: datetime.datetime) -> float:
     """
@@ -38,12 +39,44 @@ def calculate_hour_difference(start: datetime.datetime, end: datetime.datetime)
     else:
         return full_hours  # 小于15分钟，视为0小时
     
+WEEKDAY_CHINESE = ["周一", "周二", "周三", "周四", "周五", "周六", "周日"]
+
 # 获取中文星期
 def get_weekday_chinese(date_str):
     date = datetime.datetime.strptime(date_str, "%Y-%m-%d").date()
     weekday_num = date.weekday()  # 返回0=Monday, 1=Tuesday, ..., 6=Sunday
-    weekday_chinese = ["周一", "周二", "周三", "周四", "周五", "周六", "周日"]
-    return weekday_chinese[weekday_num]
+    return WEEKDAY_CHINESE[weekday_num]
+
+# 日期类型 -> detail 表中的中文类型（其他类型按工作日显示）
+DAY_TYPE_LABELS = {"holiday": "节假日", "restday": "公休日", "workday": "工作日"}
+
+
+class MonthContext:
+    """
+    某年某月的日历信息，按 (年, 月) 只计算一次，由该月处理的所有员工共用。
+    各列表按日期顺序一一对应，index 为日期字符串到下标的映射。
+    """
+
+    def __init__(self, year, month, day_check):
+        self.year = year
+        self.month = month
+        self.dates = [datetime.date(year, month, day) for day in range(1, calendar.monthrange(year, month)[1] + 1)]
+        self.date_strs = [date.strftime("%Y-%m-%d") for date in self.dates]
+        self.weekdays = [WEEKDAY_CHINESE[date.weekday()] for date in self.dates]
+        self.day_types = [day_check.get_day_type(date) for date in self.dates]
+        self.day_type_labels = [DAY_TYPE_LABELS.get(day_type, "工作日") for day_type in self.day_types]
+        self.index = {date_str: i for i, date_str in enumerate(self.date_strs)}
+
+
+# (日历年份, 年, 月) -> MonthContext；日历数据只与年份有关，可在所有考勤管理器间共用
+_month_contexts = {}
+
+# detail 表表头
+DETAIL_HEADER = [
+    "日期", "星期", "类型", "状态",  # 新增的“类型”和“状态”列
+    "上午上班时间", "上午下班时间", "下午上班时间", "下午下班时间", 
+    "加班开始时间", "加班结束时间", "加班时长", "加班原因"
+]
 
 class NonWorkdayAttendance:
     def __init__(self):
@@ -107,6 +140,15 @@ class AttendanceManager:
         self.is_flexible = is_flexible  # 是否开启弹性工作制
         self.day_check = DayCheck(year)  # 初始化日期判断类
 
+    def get_month_context(self, month, year=None):
+        """取得 (年, 月) 的日历信息，首次使用时计算"""
+        year = year or self.year
+        key = (self.year, year, month)
+        context = _month_contexts.get(key)
+        if context is None:
+            context = _month_contexts[key] = MonthContext(year, month, self.day_check)
+        return context
+
     def process_attendance(self, attendance_data):
         """处理传入的考勤数据字典"""
         result = {}
@@ -115,14 +157,15 @@ class AttendanceManager:
             result[date_str] = self.check_in_out(date, punches)
         return result
 
-    def check_in_out(self, date: datetime.date, punches: list):
-        """检查打卡数据"""
+    def check_in_out(self, date: datetime.date, punches: list, day_type=None):
+        """检查打卡数据，day_type 已知时（如来自 MonthContext）不再重复判断"""
 
         # 将打卡时间转换为datetime对象
         punches = [datetime.datetime.strptime(p, "%Y-%m-%d %H:%M:%S") for p in punches]
         
         # 根据日期判断类型
-        day_type = self.day_check.get_day_type(date)
+        if day_type is None:
+            day_type = self.day_check.get_day_type(date)
 
         # 检查并处理工作日考勤
         if day_type == "workday":
@@ -324,28 +367,15 @@ class AttendanceManager:
 
     """处理指定年份和月份的考勤情况"""
     def process_month(self, month, attendance_data):
-        # 获取该月的最大天数
-        max_day = calendar.monthrange(self.year, month)[1]  # 获取该月的天数
-
-        # 获取该月的所有日期
-        month_dates = []
-        for day in range(1, max_day + 1):  # 从 1 到 max_day
-            try:
-                # 将日期添加到 month_dates 列表中
-                date = datetime.date(self.year, month, day)
-                month_dates.append(date)
-            except ValueError as e:
-                # 捕获无效日期的异常（如2月30日），并跳过
-                logger.error(f"Invalid date for {self.year}-{month}-{day}: {e}")
-                continue
+        # 该月的日期及类型已预先算好，同月的所有员工共用
+        context = self.get_month_context(month)
 
         results = {}
 
-        for date in month_dates:
-            date_str = date.strftime("%Y-%m-%d")
+        for date, date_str, day_type in zip(context.dates, context.date_strs, context.day_types):
             if date_str in attendance_data:
                 punches = attendance_data[date_str]
-                result = self.check_in_out(date, punches)
+                result = self.check_in_out(date, punches, day_type)
                 results[date_str] = result
 
                 # # 打印详细信息
@@ -366,7 +396,6 @@ class AttendanceManager:
                 #     if result.work_end_time:
                 #         print(f"  下班时间: {result.work_end_time}")
             else:
-                day_type = self.day_check.get_day_type(date)
                 if day_type == "workday":
                     results[date_str] = "缺勤"
                     # print(f"{date_str}: 缺勤")
@@ -378,71 +407,73 @@ class AttendanceManager:
 
 
 
-    def write_attendance_to_excel(self, wb, attendance_data):
-        """
-        将考勤数据写入到 Excel 工作簿的 `detail` 表中。
+    @staticmethod
+    def get_status(data):
+        """判断单日考勤结果的状态，返回 正常/异常/普通加班/节日加班/公休加班"""
+        status = "正常"  # 默认是正常
 
-        参数：
-        wb (openpyxl.Workbook): 一个工作簿对象
-        attendance_data (dict): 包含考勤数据的字典
-        """
-        # 删除默认的工作表
-        if 'Sheet' in wb.sheetnames:
-            del wb['Sheet']
+        if data == "缺勤":
+            status = "异常"
+        
+        elif isinstance(data, WorkdayAttendance):
+            # 检查是否存在缺卡、迟到或早退
+            if any([data.morning_in["status"] in ["缺卡", "迟到"],
+                    data.morning_out["status"] in ["缺卡", "早退"],
+                    data.afternoon_in["status"] in ["缺卡", "迟到"],
+                    data.afternoon_out["status"] in ["缺卡", "早退"]]):
+                status = "异常"
+            # 如果加班时间存在，判断为加班
+            elif any([data.overtime_in["status"] != None, data.overtime_out["status"] != None]):
+                status = "普通加班"
+        
+        elif isinstance(data, NonWorkdayAttendance):
+            if any([data.status in ["缺卡", "迟到"]]):
+                status = "异常"
+            # 如果加班时间存在，判断为加班
+            elif any([data.status == "节日加班"]):
+                status = "节日加班"
+            elif any([data.status == "公休加班"]):
+                status = "公休加班"
 
-        # 创建一个工作表名为 "detail"
-        ws = wb.create_sheet(title="detail")
+        return status
 
-        # 定义黄色和红色的单元格填充样式
-        yellow_fill = PatternFill(start_color="FFFF00", end_color="FFFF00", fill_type="solid")
-        red_fill = PatternFill(start_color="FF0000", end_color="FF0000", fill_type="solid")
+    def summarize(self, attendance_data):
+        """统计 process_month 的结果，返回天数、各状态天数及加班总时长"""
+        summary = {"天数": 0, "正常": 0, "异常": 0, "加班": 0, "加班时长": 0}
 
-        # 写入表头
-        ws.append([
-            "日期", "星期", "类型", "状态",  # 新增的“类型”和“状态”列
-            "上午上班时间", "上午下班时间", "下午上班时间", "下午下班时间", 
-            "加班开始时间", "加班结束时间", "加班时长", "加班原因"
-        ])
+        for data in attendance_data.values():
+            summary["天数"] += 1
+            status = self.get_status(data)
+            if "加班" in status:
+                summary["加班"] += 1
+            else:
+                summary[status] += 1
 
-        # 遍历考勤数据字典，逐行写入
+            if isinstance(data, (WorkdayAttendance, NonWorkdayAttendance)):
+                summary["加班时长"] += data.overtime_hours
+
+        return summary
+
+    def iter_detail_rows(self, attendance_data):
+        """
+        按 detail 表的列顺序逐行产出考勤数据。
+
+        返回：
+        generator: (row, status)，row 与 DETAIL_HEADER 对应，status 为该日状态
+        """
+        contexts = {}  # "YYYY-MM" -> MonthContext，通常只有一个月
         for date_str, data in attendance_data.items():
-            date = datetime.datetime.strptime(date_str, "%Y-%m-%d").date()
-            weekday = get_weekday_chinese(date_str)
+            context = contexts.get(date_str[:7])
+            if context is None:
+                context = contexts[date_str[:7]] = self.get_month_context(int(date_str[5:7]), int(date_str[:4]))
 
-            # 判断类型（工作日/非工作日）
-            day_type = self.day_check.get_day_type(date)
-            if "holiday" == day_type:
-                day_type = "节假日"
-            elif "restday" == day_type:
-                day_type = "公休日"
-            else:
-                day_type = "工作日"
+            # 星期及类型（工作日/非工作日）直接取预先算好的结果
+            i = context.index[date_str]
+            weekday = context.weekdays[i]
+            day_type = context.day_type_labels[i]
 
             # 判断状态（异常、加班、正常）
-            status = "正常"  # 默认是正常
-
-            if data == "缺勤":
-                status = "异常"
-            
-            elif isinstance(data, WorkdayAttendance):
-                # 检查是否存在缺卡、迟到或早退
-                if any([data.morning_in["status"] in ["缺卡", "迟到"],
-                        data.morning_out["status"] in ["缺卡", "早退"],
-                        data.afternoon_in["status"] in ["缺卡", "迟到"],
-                        data.afternoon_out["status"] in ["缺卡", "早退"]]):
-                    status = "异常"
-                # 如果加班时间存在，判断为加班
-                elif any([data.overtime_in["status"] != None, data.overtime_out["status"] != None]):
-                    status = "普通加班"
-            
-            elif isinstance(data, NonWorkdayAttendance):
-                if any([data.status in ["缺卡", "迟到"]]):
-                    status = "异常"
-                # 如果加班时间存在，判断为加班
-                elif any([data.status == "节日加班"]):
-                    status = "节日加班"
-                elif any([data.status == "公休加班"]):
-                    status = "公休加班"
+            status = self.get_status(data)
 
             # 初始化每行的数据
             row = [date_str, weekday, day_type, status]
@@ -472,6 +503,37 @@ class AttendanceManager:
                             data.work_end_time if data.work_end_time else ""])
                 row.extend([data.overtime_hours if data.overtime_hours else "",])
 
+            yield row, status
+
+    def write_attendance_to_excel(self, wb, attendance_data, title="detail"):
+        """
+        将考勤数据写入到 Excel 工作簿的 `detail` 表中。
+
+        参数：
+        wb (openpyxl.Workbook): 一个工作簿对象
+        attendance_data (dict): 包含考勤数据的字典
+        """
+        # 删除默认的工作表
+        if 'Sheet' in wb.sheetnames:
+            del wb['Sheet']
+
+        # 创建工作表，默认名为 "detail"
+        ws = wb.create_sheet(title=title)
+
+        # 定义黄色和红色的单元格填充样式
+        yellow_fill = PatternFill(start_color="FFFF00", end_color="FFFF00", fill_type="solid")
+        red_fill = PatternFill(start_color="FF0000", end_color="FF0000", fill_type="solid")
+
+        if getattr(wb, "write_only", False):
+            self._write_detail_write_only(ws, attendance_data, yellow_fill, red_fill)
+            print(f"考勤数据已成功写入 Excel 文件的 {title} 表中。")
+            return
+
+        # 写入表头
+        ws.append(DETAIL_HEADER)
+
+        # 遍历考勤数据字典，逐行写入
+        for row, status in self.iter_detail_rows(attendance_data):
             # 写入当前行数据
             ws.append(row)
 
@@ -503,7 +565,35 @@ class AttendanceManager:
             adjusted_width = max_length + 2  # 添加一些缓冲空间
             ws.column_dimensions[column].width = adjusted_width
 
-        print("考勤数据已成功写入 Excel 文件的 detail 表中。")
+        print(f"考勤数据已成功写入 Excel 文件的 {title} 表中。")
+
+    def _write_detail_write_only(self, ws, attendance_data, yellow_fill, red_fill):
+        """
+        只写工作簿的 detail 表：列宽须在写入数据前设置，单元格样式通过 WriteOnlyCell 指定，
+        输出内容、填充色和列宽与普通模式相同。
+        """
+        rows = list(self.iter_detail_rows(attendance_data))  # 至多一个月
+
+        # 自动调整列宽
+        widths = [len(str(value)) for value in DETAIL_HEADER]
+        for row, _ in rows:
+            for i, value in enumerate(row):
+                widths[i] = max(widths[i], len(str(value) if value else ""))
+        for i, width in enumerate(widths, start=1):
+            ws.column_dimensions[get_column_letter(i)].width = width + 2
+
+        ws.append(DETAIL_HEADER)
+        for row, status in rows:
+            fill = yellow_fill if "加班" in status else red_fill if status == "异常" else None
+            if fill is not None:
+                row = row + [None] * (11 - len(row))  # 与普通模式一致，填充前 11 列（含空单元格）
+            cells = []
+            for value in row:
+                cell = WriteOnlyCell(ws, value=value)
+                if fill is not None:
+                    cell.fill = fill
+                cells.append(cell)
+            ws.append(cells)
 
     def _get_time_or_empty(self, status_info):
         """
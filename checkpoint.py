@@ -0,0 +1,77 @@
+import json
+import os
+import time
+from log_config import logger
+
+
+def file_fingerprint(file_path):
+    """文件指纹（大小 + 修改时间），输入文件变化后对应的单元需要重新处理"""
+    stat = os.stat(file_path)
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+
+def unit_key(files, year, months, threshold_minutes, extra=""):
+    """生成处理单元的唯一标识：输入文件及其指纹、年月、过滤阈值和其他参数"""
+    parts = [f"{os.path.abspath(f)}@{file_fingerprint(f)}" for f in files]
+    parts.append(f"{year}:{','.join(str(m) for m in months)}:tm={threshold_minutes}")
+    if extra:
+        parts.append(extra)
+    return "|".join(parts)
+
+
+class Journal:
+    """
+    批处理检查点日志（JSONL，每行一条记录，追加写入并立即落盘）。
+
+    每个单元完成后记录其输出文件；中断后以 resume 方式重新运行时，
+    已完成且输出文件仍存在的单元会被跳过，只重试失败或缺失的单元。
+    """
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        self.records = {}  # 单元标识 -> 最后一条记录
+
+        if resume:
+            self._load()
+        elif os.path.exists(path):
+            os.remove(path)  # 非续跑模式重新开始记录
+
+        directory = os.path.dirname(os.path.abspath(path))
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # 中断时可能留下写了一半的最后一行，忽略即可
+                    logger.warning(f"忽略无法解析的检查点记录: {line.strip()[:80]}")
+                    continue
+                self.records[record["unit"]] = record
+        logger.info(f"已加载检查点: {self.path}, 共 {len(self.records)} 个单元")
+
+    def _append(self, record):
+        self.records[record["unit"]] = record
+        with open(self.path, 'a', encoding='utf-8') as file:
+            file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+
+    def is_done(self, unit):
+        """单元已完成且其输出文件都还在"""
+        record = self.records.get(unit)
+        return (record is not None and record["status"] == "done"
+                and all(os.path.exists(p) for p in record["outputs"]))
+
+    def get(self, unit):
+        return self.records.get(unit)
+
+    def record_done(self, unit, outputs, info=None):
+        self._append({"unit": unit, "status": "done", "outputs": list(outputs), "info": info, "time": time.time()})
+
+    def record_failed(self, unit, error):
+        self._append({"unit": unit, "status": "failed", "outputs": [], "error": str(error), "time": time.time()})
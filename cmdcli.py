@@ -4,6 +4,9 @@ from log_config import logger
 from parse import *
 from utils import *
 from main import process_file
+from exporter import OUTPUT_FORMATS
+from resultindex import STATUS_CODES, ResultIndex
+import time
 import sys
 
 class IPCiCmd(cmd.Cmd):
@@ -21,9 +24,24 @@ class IPCiCmd(cmd.Cmd):
         self.parser.add_argument('month', type=int, help="月份")
         self.parser.add_argument('--tm', type=int, default=3, help="设置时间阈值，单位分钟，默认 3")
         self.parser.add_argument('--debug', action='store_true', help="开启调试模式，传入 --debug 开启调试")    
+        self.parser.add_argument('--format', nargs='+', choices=OUTPUT_FORMATS, default=["xlsx"], help="输出格式，可同时指定多个，默认 xlsx")
+        self.parser.add_argument('--merge', nargs='+', default=[], metavar='FILE', help="同一周期内其他考勤机的导出文件")
+
+        # 查询命令参数
+        self.query_parser = argparse.ArgumentParser(prog="query", description="查询已处理的考勤结果")
+        self.query_parser.add_argument('code', choices=STATUS_CODES, help="状态码")
+        self.query_parser.add_argument('date', nargs='?', help="日期，如 2025-02-12")
+        self.query_parser.add_argument('--employee', help="员工（考勤文件名）")
+
+        self.top_parser = argparse.ArgumentParser(prog="top", description="员工排行")
+        self.top_parser.add_argument('metric', choices=STATUS_CODES, help="overtime 按加班时长，其他按天数")
+        self.top_parser.add_argument('n', nargs='?', type=int, default=10, help="显示数量，默认 10")
+
+        # 已处理结果的内存索引
+        self.results = ResultIndex()
 
     def do_process(self, arg):
-        """处理解析命令，格式: process <file_path> <year> <month> [--tm 3] [--debug]"""
+        """处理解析命令，格式: process <file_path> <year> <month> [--tm 3] [--debug] [--merge FILE ...] [--format xlsx csv jsonl]"""
         # 使用 argparse 解析输入的参数
         try:
             args = self.parser.parse_args(arg.split())
@@ -38,10 +56,51 @@ class IPCiCmd(cmd.Cmd):
         is_debug = args.debug
 
         # 打印解析结果（用于调试）
-        logger.debug(f"文件路径: {file_path}, 年份: {year}, 月份: {month}, 时间阈值: {threshold_minutes}, 调试模式: {is_debug}")
+        logger.debug("文件路径: %s, 年份: %s, 月份: %s, 时间阈值: %s, 调试模式: %s",
+                     file_path, year, month, threshold_minutes, is_debug)
         
-        # 调用文件处理函数
-        process_file(file_path, year, month, threshold_minutes, is_debug)
+        # 调用文件处理函数，结果保存到索引中供 query/top 使用
+        result = process_file([file_path] + args.merge, year, month, threshold_minutes, is_debug, formats=args.format)
+        if result is not None:
+            self.results.add(get_employee_name(file_path), result)
+
+    def do_query(self, arg):
+        """查询已处理结果，格式: query <late|early|missing|absent|abnormal|overtime> [date] [--employee X]"""
+        try:
+            args = self.query_parser.parse_args(arg.split())
+        except SystemExit:
+            return
+
+        start = time.perf_counter()
+        records = self.results.query(args.code, args.date, args.employee)
+        elapsed = (time.perf_counter() - start) * 1000
+
+        for record in records:
+            data = record["data"]
+            if hasattr(data, "morning_in"):
+                detail = " ".join(f"{p}:{getattr(data, p)['status']}" for p in
+                                  ["morning_in", "morning_out", "afternoon_in", "afternoon_out"])
+            else:
+                detail = getattr(data, "status", data)
+            overtime = f" 加班{record['overtime_hours']}小时" if record["overtime_hours"] else ""
+            print(f"{record['date']} {record['employee']} {record['status']} {detail}{overtime}")
+        print(f"共 {len(records)} 条 ({STATUS_CODES[args.code]})，耗时 {elapsed:.2f} ms")
+
+    def do_top(self, arg):
+        """员工排行，格式: top <overtime|late|...> [n]"""
+        try:
+            args = self.top_parser.parse_args(arg.split())
+        except SystemExit:
+            return
+
+        start = time.perf_counter()
+        ranking = self.results.top(args.metric, args.n)
+        elapsed = (time.perf_counter() - start) * 1000
+
+        unit = "小时" if args.metric == "overtime" else "天"
+        for i, (employee, value) in enumerate(ranking, 1):
+            print(f"{i:>3}. {employee} {value}{unit}")
+        print(f"共 {len(ranking)} 人，耗时 {elapsed:.2f} ms")
 
     def do_filter(self, arg):
         """处理过滤命令，格式: filter <file_path> <year> <month> [--tm 3] [--debug]"""
@@ -59,7 +118,8 @@ class IPCiCmd(cmd.Cmd):
         is_debug = args.debug
 
         # 打印解析结果（用于调试）
-        logger.debug(f"文件路径: {file_path}, 年份: {year}, 月份: {month}, 时间阈值: {threshold_minutes}, 调试模式: {is_debug}")
+        logger.debug("文件路径: %s, 年份: %s, 月份: %s, 时间阈值: %s, 调试模式: %s",
+                     file_path, year, month, threshold_minutes, is_debug)
         
         src_dict = convert_file(file_path)
         filter_dict = filter_times(src_dict, year, month, threshold_minutes, is_debug)
@@ -79,7 +139,7 @@ class IPCiCmd(cmd.Cmd):
         is_debug = args.debug
         
         # 打印解析结果（用于调试）
-        logger.debug(f"文件路径: {file_path}, 调试模式: {is_debug}")
+        logger.debug("文件路径: %s, 调试模式: %s", file_path, is_debug)
         
         src_dict = convert_file(file_path)
         if(is_debug):
@@ -94,5 +154,7 @@ class IPCiCmd(cmd.Cmd):
     def do_help(self, arg):
         """显示帮助信息"""
         print("命令:")
-        print("  process <file_path> <year> <month> [--tm 3] [--debug] 解析文件并生成结果")
+        print("  process <file_path> <year> <month> [--tm 3] [--debug] [--merge FILE ...] [--format xlsx csv jsonl] 解析文件并生成结果")
+        print("  query <late|early|missing|absent|abnormal|overtime> [date] [--employee X] 查询已处理的结果")
+        print("  top <overtime|late|...> [n]      员工排行（加班时长或状态天数）")
         print("  exit                             退出交互模式")
\ No newline at end of file
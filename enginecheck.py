@@ -0,0 +1,236 @@
+"""
+分类引擎等价性与性能校验工具。
+
+随机生成普通及边界打卡日（弹性时间延长下班、午间一次/两次打卡、13:00 上下午分界、不足四次打卡等），
+检查待测引擎与当前参考实现的结果完全一致，并并列输出各引擎的吞吐量（天/秒）。
+
+用法:
+    python enginecheck.py --cases 20000 --seed 1 --engine mymodule:fast_workday
+    python enginecheck.py --engine mymodule:fast_filter:filter
+
+引擎类型：
+    workday  fn(manager, date, punches) -> WorkdayAttendance，punches 为已过滤排序的 datetime 列表
+    filter   fn(input_dict, year, month, threshold_minutes) -> dict，与 parse.filter_times 相同
+"""
+import argparse
+import contextlib
+import datetime
+import importlib
+import io
+import random
+import time
+from attendanceManager import AttendanceManager
+from live import IncrementalFilter, WorkdayState
+from parse import filter_times, iter_filter_times
+
+# handle_workday 中各时间段的分界点（时, 分），边界附近最容易出错
+BOUNDARIES = [(8, 30), (9, 0), (12, 10), (13, 0), (13, 40), (18, 0), (18, 30), (18, 45), (19, 15)]
+# 边界附近的秒级偏移
+EDGE_OFFSETS = [0, 0, 1, -1, 59, -59, 60, -60, 61, 300, -300]
+PERIODS = ["morning_in", "morning_out", "afternoon_in", "afternoon_out", "overtime_in", "overtime_out"]
+
+
+def reference_workday(manager, date, punches):
+    """参考实现：当前的 AttendanceManager.handle_workday"""
+    return manager.handle_workday(date, punches)
+
+
+def stream_filter(input_dict, year, month, threshold_minutes=3):
+    """流式过滤 iter_filter_times 作为 filter_times 的候选引擎"""
+    day_stream = ((date, sorted(times)) for date, times in sorted(input_dict.items()))
+    return dict(iter_filter_times(day_stream, year, month, threshold_minutes))
+
+
+def live_workday(manager, date, punches):
+    """实时模式的增量状态逐条喂入后结算，应与 handle_workday 一致"""
+    state = WorkdayState(date, manager.is_flexible)
+    for punch in punches:
+        state.feed(punch)
+    return state.finish()
+
+
+def live_filter(input_dict, year, month, threshold_minutes=3):
+    """实时模式的逐条去重作为 filter_times 的候选引擎"""
+    month_prefix = f"{year:04d}-{month:02d}"
+    result = {}
+    for date, times in input_dict.items():
+        if date[:7] != month_prefix:
+            continue
+        incremental = IncrementalFilter(threshold_minutes)
+        kept = []
+        for time in sorted(datetime.datetime.strptime(t, "%Y-%m-%d %H:%M:%S") for t in times):
+            confirmed = incremental.add(time)
+            if confirmed is not None:
+                kept.append(confirmed)
+        if incremental.pending is not None:
+            kept.append(incremental.pending)
+        result[date] = [t.strftime("%Y-%m-%d %H:%M:%S") for t in kept]
+    return result
+
+
+# 内置引擎：名称 -> (类型, 函数)
+ENGINES = {
+    "reference": ("workday", reference_workday),
+    "live": ("workday", live_workday),
+    "filter_times": ("filter", filter_times),
+    "stream_filter": ("filter", stream_filter),
+    "live_filter": ("filter", live_filter),
+}
+REFERENCE = {"workday": "reference", "filter": "filter_times"}
+
+
+def load_engine(spec):
+    """加载 module:function[:kind] 形式的外部引擎，kind 默认为 workday"""
+    parts = spec.split(":")
+    if len(parts) not in (2, 3):
+        raise ValueError(f"引擎格式应为 module:function[:kind]: {spec}")
+    kind = parts[2] if len(parts) == 3 else "workday"
+    if kind not in REFERENCE:
+        raise ValueError(f"不支持的引擎类型: {kind}")
+    fn = getattr(importlib.import_module(parts[0]), parts[1])
+    return f"{parts[0]}.{parts[1]}", kind, fn
+
+
+def _random_time(rng, date):
+    base = datetime.datetime.combine(date, datetime.time(0))
+    if rng.random() < 0.5:
+        hour, minute = rng.choice(BOUNDARIES)
+        return base + datetime.timedelta(hours=hour, minutes=minute, seconds=rng.choice(EDGE_OFFSETS))
+    return base + datetime.timedelta(seconds=rng.randint(6 * 3600, 23 * 3600))
+
+
+def generate_day(rng, date, threshold_minutes=3):
+    """生成一天的原始打卡（字符串、乱序、可能含阈值内的重复打卡）"""
+    punches = [_random_time(rng, date) for _ in range(rng.choice([0, 1, 2, 3, 4, 4, 4, 5, 6]))]
+
+    # 弹性时间：上午 (8:30, 9:00] 打卡后，下班边界顺延到 18:00 + 延长量（及其后 45 分钟的加班分界）
+    if rng.random() < 0.3:
+        extension = datetime.timedelta(seconds=rng.randint(1, 30 * 60))
+        morning = datetime.datetime.combine(date, datetime.time(8, 30)) + extension
+        evening = datetime.datetime.combine(date, datetime.time(18, 0)) + extension
+        evening += datetime.timedelta(minutes=rng.choice([0, 45]), seconds=rng.choice(EDGE_OFFSETS))
+        punches += [morning, evening]
+
+    # 阈值附近的重复打卡
+    for punch in list(punches):
+        if rng.random() < 0.15:
+            punches.append(punch + datetime.timedelta(seconds=rng.randint(0, threshold_minutes * 60 + 30)))
+
+    rng.shuffle(punches)
+    return [p.strftime("%Y-%m-%d %H:%M:%S") for p in punches]
+
+
+def generate_cases(manager, count, seed=0, threshold_minutes=3):
+    """在该年的工作日中随机生成 count 个打卡日，返回 [(date, 原始打卡字符串列表), ...]"""
+    rng = random.Random(seed)
+    workdays = sorted(manager.day_check.workdays)
+    return [(date, generate_day(rng, date, threshold_minutes))
+            for date in (rng.choice(workdays) for _ in range(count))]
+
+
+def _normalize(result):
+    """把单日结果转换为可直接比较的元组"""
+    if not hasattr(result, "morning_in"):
+        return result
+    return tuple((getattr(result, p)["status"], getattr(result, p)["time"]) for p in PERIODS) + (result.overtime_hours,)
+
+
+def _run_filter(fn, cases, threshold_minutes):
+    return [fn({date.strftime("%Y-%m-%d"): raw}, date.year, date.month, threshold_minutes)
+            for date, raw in cases]
+
+
+def _run_workday(fn, manager, inputs):
+    return [_normalize(fn(manager, date, punches)) for date, punches in inputs]
+
+
+def _timed(run):
+    # 参考实现会 print 异常信息，校验时丢弃
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        outputs = run()
+        seconds = time.perf_counter() - start
+    return outputs, seconds
+
+
+def check_engines(engines, cases, year, threshold_minutes=3, max_report=5):
+    """
+    校验各引擎与参考实现的一致性并统计吞吐量。
+
+    参数：
+    engines (list): [(名称, 类型, 函数), ...]，应包含各类型的参考引擎
+    cases (list): generate_cases 生成的打卡日
+
+    返回：
+    list: [{"name", "kind", "days_per_second", "mismatches", "examples"}, ...]
+    """
+    reports = []
+    reference_outputs = {}
+
+    # 工作日引擎的输入：参考过滤后的 datetime 列表
+    inputs = []
+    for date, raw in cases:
+        filtered = filter_times({date.strftime("%Y-%m-%d"): raw}, date.year, date.month, threshold_minutes)
+        punches = filtered.get(date.strftime("%Y-%m-%d"), [])
+        inputs.append((date, [datetime.datetime.strptime(p, "%Y-%m-%d %H:%M:%S") for p in punches]))
+
+    # 参考引擎排在最前，先得到基准结果
+    engines = sorted(engines, key=lambda e: e[0] != REFERENCE[e[1]])
+    for is_flexible in (True, False):
+        manager = AttendanceManager(year, is_flexible=is_flexible)
+        for name, kind, fn in engines:
+            if kind == "filter" and not is_flexible:
+                continue  # 过滤与弹性设置无关
+            if kind == "filter":
+                outputs, seconds = _timed(lambda: _run_filter(fn, cases, threshold_minutes))
+            else:
+                outputs, seconds = _timed(lambda: _run_workday(fn, manager, inputs))
+
+            key = (kind, is_flexible)
+            if name == REFERENCE[kind]:
+                reference_outputs[key] = outputs
+            expected = reference_outputs[key]
+
+            mismatches = [i for i, (a, b) in enumerate(zip(expected, outputs)) if a != b]
+            reports.append({
+                "name": name if kind == "filter" else f"{name}[{'flexible' if is_flexible else 'fixed'}]",
+                "kind": kind,
+                "days_per_second": len(cases) / seconds if seconds else float("inf"),
+                "mismatches": len(mismatches),
+                "examples": [
+                    {"date": str(cases[i][0]), "raw": cases[i][1], "expected": expected[i], "actual": outputs[i]}
+                    for i in mismatches[:max_report]
+                ],
+            })
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="校验考勤分类引擎与参考实现的一致性并比较吞吐量")
+    parser.add_argument('--cases', type=int, default=10000, help="随机打卡日数量，默认 10000")
+    parser.add_argument('--seed', type=int, default=0, help="随机种子，默认 0")
+    parser.add_argument('--year', type=int, default=2025, help="日历年份，默认 2025")
+    parser.add_argument('--tm', type=int, default=3, help="过滤阈值，单位分钟，默认 3")
+    parser.add_argument('--engine', action='append', default=[], help="待测引擎 module:function[:kind]，可多次指定")
+    args = parser.parse_args()
+
+    engines = [(name, kind, fn) for name, (kind, fn) in ENGINES.items()]
+    engines += [load_engine(spec) for spec in args.engine]
+
+    cases = generate_cases(AttendanceManager(args.year), args.cases, args.seed, args.tm)
+    reports = check_engines(engines, cases, args.year, args.tm)
+
+    print(f"{'引擎':<40}{'类型':<10}{'天/秒':>12}{'不一致':>8}")
+    for report in reports:
+        print(f"{report['name']:<40}{report['kind']:<10}{report['days_per_second']:>12.0f}{report['mismatches']:>8}")
+
+    failed = [r for r in reports if r["mismatches"]]
+    for report in failed:
+        print(f"\n{report['name']} 与参考实现不一致，示例:")
+        for example in report["examples"]:
+            print(f"  {example}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
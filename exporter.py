@@ -0,0 +1,81 @@
+import csv
+import json
+import os
+from attendanceManager import DETAIL_HEADER
+from utils import SRC_HEADER, iter_src_rows
+
+# 支持的输出格式
+OUTPUT_FORMATS = ("xlsx", "csv", "jsonl")
+# 文本输出的写缓冲区大小
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+
+def json_default(value):
+    """JSON 序列化时把 datetime 等对象转成字符串"""
+    if hasattr(value, "strftime"):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    return str(value)
+
+
+def _to_text(value):
+    if hasattr(value, "strftime"):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    return value
+
+
+def write_csv(path, header, rows):
+    """按行流式写出 CSV（带 BOM，Excel 可直接打开中文）"""
+    with open(path, 'w', newline='', encoding='utf-8-sig', buffering=WRITE_BUFFER_SIZE) as file:
+        writer = csv.writer(file)
+        writer.writerow(header)
+        writer.writerows([_to_text(value) for value in row] for row in rows)
+
+
+def write_jsonl(path, header, rows):
+    """按行流式写出 JSON Lines，每行一个对象；列表行以表头为键，字典行原样写出"""
+    with open(path, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as file:
+        for row in rows:
+            record = row if isinstance(row, dict) else dict(zip(header, row))
+            file.write(json.dumps(record, ensure_ascii=False, default=json_default))
+            file.write("\n")
+
+
+def get_output_files(output_file, formats):
+    """process_file 各输出格式对应的文件路径（与 export_text 的命名一致）"""
+    base_path = os.path.splitext(output_file)[0]
+    outputs = []
+    for fmt in formats:
+        if fmt == "xlsx":
+            outputs.append(output_file)
+        else:
+            outputs += [f"{base_path}.src.{fmt}", f"{base_path}.detail.{fmt}"]
+    return outputs
+
+
+def export_text(base_path, formats, attendance_manager, filter_dict, result):
+    """
+    将 src（过滤后的打卡时间）与 detail（考勤结果）导出为 CSV/JSONL，不经过 openpyxl。
+
+    参数：
+    base_path (str): 输出路径前缀，生成 <base>.src.csv、<base>.detail.csv 等文件
+    formats (list): 输出格式，忽略其中的 xlsx
+
+    返回：
+    list: 写出的文件路径
+    """
+    writers = {"csv": write_csv, "jsonl": write_jsonl}
+    outputs = []
+    for fmt in formats:
+        if fmt not in writers:
+            continue
+        src_rows = iter_src_rows(filter_dict, attendance_manager)
+        if fmt == "jsonl":
+            # 打卡次数不固定，JSONL 中以列表保存，避免超出表头的打卡被截断
+            src_rows = ({"日期": row[0], "星期": row[1], "打卡时间": [t for t in row[2:] if t]} for row in src_rows)
+        src_path = f"{base_path}.src.{fmt}"
+        writers[fmt](src_path, SRC_HEADER, src_rows)
+        detail_path = f"{base_path}.detail.{fmt}"
+        writers[fmt](detail_path, DETAIL_HEADER,
+                     (row for row, _ in attendance_manager.iter_detail_rows(result)))
+        outputs += [src_path, detail_path]
+    return outputs
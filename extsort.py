@@ -0,0 +1,100 @@
+import heapq
+import os
+import sys
+import tempfile
+from itertools import groupby
+from log_config import logger
+
+# 一次最多同时归并的临时文件数，超过时先分批归并成更大的有序段
+MAX_MERGE_FANIN = 64
+
+
+def _estimate_size(item):
+    """估算一条打卡记录在内存中的占用（字符串对象 + 列表中的指针）"""
+    return sys.getsizeof(item) + 8
+
+
+def _spill(buffer, tmp_dir):
+    """将缓冲区排序后写入临时文件，返回文件路径"""
+    buffer.sort()
+    fd, path = tempfile.mkstemp(prefix="ipci-run-", suffix=".txt", dir=tmp_dir)
+    with os.fdopen(fd, 'w', encoding='utf-8') as file:
+        file.writelines(f"{item}\n" for item in buffer)
+    return path
+
+
+def _iter_run(path):
+    with open(path, 'r', encoding='utf-8') as file:
+        for line in file:
+            yield line.rstrip("\n")
+
+
+def _merge_runs(paths, tmp_dir):
+    """把多个有序临时文件归并为一个新的有序临时文件"""
+    fd, path = tempfile.mkstemp(prefix="ipci-run-", suffix=".txt", dir=tmp_dir)
+    with os.fdopen(fd, 'w', encoding='utf-8') as file:
+        file.writelines(f"{item}\n" for item in heapq.merge(*[_iter_run(p) for p in paths]))
+    for p in paths:
+        os.remove(p)
+    return path
+
+
+def external_sort(items, memory_budget, tmp_dir=None):
+    """
+    受内存预算约束的外部排序。
+
+    缓冲区的估算占用达到 memory_budget（字节）时，将其排序后写入临时文件；
+    输入读完后对所有有序段做 k 路归并，惰性地产出升序结果。
+    数据量不超过预算时不会产生任何临时文件。
+
+    参数：
+    items (iterable): 待排序的字符串，如 "YYYY-MM-DD HH:MM:SS"（字典序即时间顺序）
+    memory_budget (int): 内存预算，单位字节
+    tmp_dir (str): 临时文件目录，默认使用系统临时目录
+    """
+    buffer = []
+    buffer_size = 0
+    runs = []
+    streams = []
+
+    try:
+        for item in items:
+            buffer.append(item)
+            buffer_size += _estimate_size(item)
+            if buffer_size >= memory_budget:
+                runs.append(_spill(buffer, tmp_dir))
+                buffer = []
+                buffer_size = 0
+
+        if not runs:
+            # 全部数据都在预算内，直接内存排序
+            buffer.sort()
+            yield from buffer
+            return
+
+        if buffer:
+            runs.append(_spill(buffer, tmp_dir))
+            buffer = []
+        logger.debug("外部排序: 共写出 %d 个有序段", len(runs))
+
+        # 有序段过多时分批归并，避免同时打开过多文件
+        while len(runs) > MAX_MERGE_FANIN:
+            batch, runs = runs[:MAX_MERGE_FANIN], runs[MAX_MERGE_FANIN:]
+            runs.append(_merge_runs(batch, tmp_dir))
+
+        streams = [_iter_run(p) for p in runs]
+        yield from heapq.merge(*streams)
+
+    finally:
+        # 先关闭打开的临时文件再删除（Windows 下无法删除仍被占用的文件）
+        for stream in streams:
+            stream.close()
+        for p in runs:
+            if os.path.exists(p):
+                os.remove(p)
+
+
+def iter_days(sorted_punches):
+    """把按时间升序的打卡流按日期分组，依次产出 (日期, 当天打卡时间列表)"""
+    for date, group in groupby(sorted_punches, key=lambda punch: punch[:10]):
+        yield date, list(group)
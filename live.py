@@ -0,0 +1,429 @@
+import copy
+import datetime
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from attendanceManager import AttendanceManager, WorkdayAttendance, calculate_hour_difference
+from log_config import logger
+from parse import PUNCH_PATTERN, _detect_encoding
+from utils import get_employee_name
+
+# 实时快照中的异常代码 -> 说明
+LIVE_CODES = {
+    "not_in": "未打上班卡",
+    "late": "迟到",
+    "early": "早退",
+    "missing": "缺卡",
+    "on_overtime": "加班中",
+    "overtime": "已加班",
+}
+
+# 与 handle_workday 相同的时间界限
+AM_WORK_START = datetime.time(8, 30)
+AM_WORK_END = datetime.time(12, 10)
+PM_WORK_START = datetime.time(13, 40)
+PM_WORK_END = datetime.time(18, 0)
+AM_PM_LINE_TIME = datetime.time(13, 00)
+FLEXIBLE_TIME = datetime.timedelta(minutes=30)
+OVERTIME = datetime.timedelta(minutes=45)
+EAT_TIME = datetime.timedelta(minutes=30)
+
+# 轮询文件新增内容的间隔（秒）
+POLL_SECONDS = 0.5
+
+
+class IncrementalFilter:
+    """
+    filter_times 的逐条版本：最后一次打卡先挂起，直到后续打卡与它的间隔超过阈值才确认。
+    间隔在阈值内的打卡替换挂起的打卡，与 _filter_day 保留较晚一次的规则一致。
+    """
+
+    def __init__(self, threshold_minutes=3):
+        self.threshold = datetime.timedelta(minutes=threshold_minutes)
+        self.pending = None
+
+    def add(self, punch):
+        """加入一次打卡，返回因此被确认的打卡（没有则为 None）"""
+        if self.pending is not None and punch - self.pending <= self.threshold:
+            self.pending = max(self.pending, punch)
+            return None
+        confirmed, self.pending = self.pending, punch
+        return confirmed
+
+
+class WorkdayState:
+    """
+    工作日的增量状态，逐条对应 handle_workday 循环中的一次判断，每次打卡 O(1) 更新。
+    finish 补齐不足四次打卡时的缺卡，结果与 handle_workday 相同。
+    """
+
+    def __init__(self, date, is_flexible=True):
+        self.is_flexible = is_flexible
+        self.am_start_time = datetime.datetime.combine(date, AM_WORK_START)
+        self.am_end_time = datetime.datetime.combine(date, AM_WORK_END)
+        self.pm_start_time = datetime.datetime.combine(date, PM_WORK_START)
+        self.pm_end_time = datetime.datetime.combine(date, PM_WORK_END)
+        self.am_pm_line_time = datetime.datetime.combine(date, AM_PM_LINE_TIME)
+
+        self.attendance = WorkdayAttendance(date)
+        self.afternoon_extension = datetime.timedelta(0)
+        self.middle_list = []  # 午间打卡
+        self.count = 0
+
+    def _set_middle(self):
+        """午间打卡归属：上午下班/下午上班"""
+        attendance = self.attendance
+        middle_list = self.middle_list
+        if len(middle_list) == 2:
+            attendance.set_status("morning_out", "正常", middle_list[0])
+            attendance.set_status("afternoon_in", "正常", middle_list[1])
+        elif len(middle_list) == 1:
+            if self.am_pm_line_time > middle_list[0]:  # 视为上午
+                attendance.set_status("morning_out", "正常", middle_list[0])
+                attendance.set_status("afternoon_in", "缺卡", None)
+            else:
+                attendance.set_status("morning_out", "缺卡", None)
+                attendance.set_status("afternoon_in", "正常", middle_list[0])
+        elif len(middle_list) == 0:
+            attendance.set_status("morning_out", "缺卡", None)
+            attendance.set_status("afternoon_in", "缺卡", None)
+        else:
+            print(f"午间存在3次及以上打卡异常:{middle_list}")
+
+    def feed(self, punch):
+        attendance = self.attendance
+        self.count += 1
+
+        if self.am_start_time >= punch:
+            if attendance.morning_in["status"] is None:
+                attendance.set_status("morning_in", "正常", punch)
+
+        elif self.am_start_time + FLEXIBLE_TIME >= punch:
+            if self.is_flexible and attendance.morning_in["status"] is None:
+                attendance.set_status("morning_in", "正常", punch)
+                self.afternoon_extension = punch - self.am_start_time
+
+        elif self.am_end_time > punch:
+            if attendance.morning_in["status"] is None:
+                attendance.set_status("morning_in", "迟到", punch)
+            else:
+                attendance.set_status("morning_out", "早退", punch)
+
+        elif self.pm_start_time >= punch:
+            if attendance.morning_in["status"] is None:
+                attendance.set_status("morning_in", "缺卡", None)
+            self.middle_list.append(punch)
+
+        elif (self.pm_end_time + self.afternoon_extension) > punch:
+            if len(self.middle_list) == 1 and self.am_pm_line_time > self.middle_list[0]:
+                # 午间只有一次上午的打卡：本次视为下午迟到上班
+                attendance.set_status("morning_out", "正常", self.middle_list[0])
+                attendance.set_status("afternoon_in", "迟到", punch)
+            elif len(self.middle_list) <= 2:
+                self._set_middle()
+                attendance.set_status("afternoon_out", "早退", punch)
+            else:
+                print(f"午间存在3次及以上打卡异常:{self.middle_list}")
+
+        elif (self.pm_end_time + self.afternoon_extension + OVERTIME) > punch:
+            attendance.set_status("afternoon_out", "正常", punch)
+            if attendance.morning_out["status"] is None or attendance.afternoon_in["status"] is None:
+                self._set_middle()
+
+        else:
+            attendance.set_status("overtime_in", "正常", self.pm_end_time + self.afternoon_extension + EAT_TIME)
+            attendance.set_status("overtime_out", "正常", punch)
+            attendance.set_status("afternoon_out", "加班", punch)
+            attendance.overtime_hours = calculate_hour_difference(attendance.overtime_in["time"],
+                                                                  attendance.overtime_out["time"])
+            if attendance.morning_out["status"] is None or attendance.afternoon_in["status"] is None:
+                self._set_middle()
+
+    def finish(self):
+        """当天结束：不足四次打卡时补齐缺卡，返回 WorkdayAttendance"""
+        attendance = self.attendance
+        if 4 > self.count:
+            for period in ("morning_in", "morning_out", "afternoon_in", "afternoon_out"):
+                if getattr(attendance, period)["status"] is None:
+                    attendance.set_status(period, "缺卡", None)
+        return attendance
+
+
+class EmployeeDay:
+    """一名员工当天的实时状态：增量去重 + 增量分类"""
+
+    def __init__(self, manager, date, threshold_minutes=3):
+        self.manager = manager
+        self.date = date
+        self.day_type = manager.get_month_context(date.month, date.year).day_types[date.day - 1]
+        self.filter = IncrementalFilter(threshold_minutes)
+        self.last_punch = None
+        if self.day_type == "workday":
+            self.state = WorkdayState(date, manager.is_flexible)
+        else:
+            self.state = []  # 非工作日只看打卡次数，最多几次
+
+    def add(self, punch):
+        self.last_punch = punch
+        confirmed = self.filter.add(punch)
+        if confirmed is not None:
+            self._feed(self.state, confirmed)
+
+    def _feed(self, state, punch):
+        if isinstance(state, WorkdayState):
+            state.feed(punch)
+        else:
+            state.append(punch)
+
+    def current(self, finished=False):
+        """
+        当前结果：在状态副本上补入挂起的打卡，不影响后续增量更新。
+        finished 为 True 时按整天结束处理（补齐缺卡），结果与 process_month 相同。
+        """
+        state = copy.deepcopy(self.state)
+        if self.filter.pending is not None:
+            self._feed(state, self.filter.pending)
+
+        if isinstance(state, WorkdayState):
+            return state.finish() if finished else state.attendance
+        if self.day_type == "restday":
+            return self.manager.handle_restday(state)
+        if self.day_type == "holiday":
+            return self.manager.handle_holiday(state)
+        return "日期类型未知"
+
+
+class _LazyStatus:
+    """日志参数：只在日志真正输出时才计算考勤状态"""
+    __slots__ = ("result",)
+
+    def __init__(self, result):
+        self.result = result
+
+    def __str__(self):
+        return AttendanceManager.get_status(self.result)
+
+
+class LiveTracker:
+    """按员工维护当天的增量考勤状态，随时生成当前异常快照"""
+
+    def __init__(self, threshold_minutes=3, is_flexible=True):
+        self.threshold_minutes = threshold_minutes
+        self.is_flexible = is_flexible
+        self.managers = {}  # 年份 -> AttendanceManager
+        self.days = {}  # 员工 -> EmployeeDay
+        self.finished = {}  # 员工 -> (日期, 前一天的最终结果)
+        self.stale = 0  # 因乱序被丢弃的打卡数
+
+    def _get_manager(self, year):
+        if year not in self.managers:
+            self.managers[year] = AttendanceManager(year, is_flexible=self.is_flexible)
+        return self.managers[year]
+
+    def add_employee(self, employee):
+        """登记员工（如跟踪的文件），尚未打卡也会出现在快照中"""
+        self.days.setdefault(employee, None)
+
+    def add(self, employee, punch):
+        """加入一次打卡；跨天时结算前一天"""
+        day = self.days.get(employee)
+        if day is not None and day.last_punch is not None and punch < day.last_punch:
+            self.stale += 1
+            logger.warning(f"忽略乱序打卡,员工:{employee},时间:{punch},上一次:{day.last_punch}")
+            return
+
+        if day is None or day.date != punch.date():
+            if day is not None:
+                result = day.current(finished=True)
+                self.finished[employee] = (day.date, result)
+                logger.debug("%s %s 结算: %s", employee, day.date, _LazyStatus(result))
+            day = EmployeeDay(self._get_manager(punch.year), punch.date(), self.threshold_minutes)
+            self.days[employee] = day
+        day.add(punch)
+
+    def _codes(self, day, now):
+        """根据当前结果和当前时间判断异常代码"""
+        codes = []
+        data = day.current()
+        if isinstance(data, WorkdayAttendance):
+            statuses = [getattr(data, p)["status"] for p in ("morning_in", "morning_out", "afternoon_in", "afternoon_out")]
+            if "迟到" in statuses:
+                codes.append("late")
+            if "早退" in statuses:
+                codes.append("early")
+            if "缺卡" in statuses:
+                codes.append("missing")
+            if data.overtime_hours:
+                codes.append("overtime")
+            elif (data.afternoon_out["status"] is None and day.last_punch is not None
+                  and now >= datetime.datetime.combine(day.date, PM_WORK_END) + OVERTIME):
+                codes.append("on_overtime")
+        elif day.day_type in ("restday", "holiday"):
+            if data.status == "缺卡":
+                codes.append("on_overtime")  # 非工作日只打了一次卡：视为正在加班
+            elif data.overtime_hours:
+                codes.append("overtime")
+        return data, codes
+
+    def snapshot(self, now):
+        """
+        生成 now 时刻的快照。
+
+        返回：
+        list: [{"employee", "date", "status", "codes", "last_punch"}, ...]，按员工排序
+        """
+        today = now.date()
+        manager = self._get_manager(now.year)
+        is_workday = manager.day_check.get_day_type(today) == "workday"
+        start_line = datetime.datetime.combine(today, AM_WORK_START)
+        if self.is_flexible:
+            start_line += FLEXIBLE_TIME
+
+        records = []
+        for employee in sorted(self.days):
+            day = self.days[employee]
+            if day is None or day.date != today:
+                # 今天还没有打卡
+                codes = ["not_in"] if is_workday and now > start_line else []
+                records.append({"employee": employee, "date": str(today), "status": "未打卡" if is_workday else "",
+                                "codes": codes, "last_punch": day.last_punch if day else None})
+                continue
+
+            data, codes = self._codes(day, now)
+            if isinstance(data, WorkdayAttendance) and data.morning_in["status"] is None and now > start_line:
+                codes.insert(0, "not_in")
+            records.append({"employee": employee, "date": str(day.date), "status": AttendanceManager.get_status(data),
+                            "codes": codes, "last_punch": day.last_punch})
+        return records
+
+
+def parse_punch_line(line, default_employee):
+    """
+    解析一行标准输入：行内的日期时间为打卡时间，之前的内容为员工标识（没有则用 default_employee）。
+
+    返回：
+    tuple: (员工, datetime)，不含打卡时间的行返回 None
+    """
+    match = PUNCH_PATTERN.search(line)
+    if not match:
+        return None
+    employee = line[:match.start()].strip() or default_employee
+    return employee, _match_to_datetime(match)
+
+
+def _match_to_datetime(match):
+    return datetime.datetime.strptime(f"{match.group(1)} {match.group(2)}", "%Y-%m-%d %H:%M:%S")
+
+
+def _read_stdin(events):
+    for line in sys.stdin:
+        parsed = parse_punch_line(line, "stdin")
+        if parsed:
+            events.put(parsed)
+    events.put(None)  # 输入结束
+
+
+def _tail_file(file_path, events, stop):
+    """
+    跟踪持续增长的导出文件：先读已有内容，再轮询新增的完整行；文件被截断时从头重读。
+    员工固定为文件名，与批量处理一致，行内的工号、姓名等内容不作为员工标识，行内每个打卡时间都计入。
+    """
+    employee = get_employee_name(file_path)
+    position = 0
+    encoding = None
+    buffer = b""
+    while not stop.is_set():
+        try:
+            size = os.path.getsize(file_path)
+        except OSError:
+            time.sleep(POLL_SECONDS)
+            continue
+        if size < position:
+            logger.warning(f"文件被截断，从头读取: {file_path}")
+            position, buffer = 0, b""
+        if size == position:
+            time.sleep(POLL_SECONDS)
+            continue
+
+        with open(file_path, 'rb') as file:
+            if encoding is None:
+                encoding = _detect_encoding(file)
+            file.seek(position)
+            chunk = file.read(size - position)
+        position += len(chunk)
+
+        *lines, buffer = (buffer + chunk).split(b"\n")
+        for line in lines:
+            for match in PUNCH_PATTERN.finditer(line.decode(encoding, errors='replace')):
+                events.put((employee, _match_to_datetime(match)))
+
+
+def write_snapshot(records, now, output_file):
+    """快照写入 JSON 文件（先写临时文件再替换，读取方不会读到一半的内容）"""
+    tmp_file = output_file + ".tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as file:
+        json.dump({"time": now.strftime("%Y-%m-%d %H:%M:%S"), "records": records}, file,
+                  ensure_ascii=False, indent=1, default=str)
+    os.replace(tmp_file, output_file)
+
+
+def log_snapshot(records, now):
+    anomalies = [r for r in records if r["codes"]]
+    logger.info(f"[{now:%Y-%m-%d %H:%M:%S}] 员工 {len(records)} 人, 异常 {len(anomalies)} 人")
+    for record in anomalies:
+        descriptions = ",".join(LIVE_CODES[code] for code in record["codes"])
+        logger.info(f"  {record['employee']}: {descriptions} (最后打卡: {record['last_punch'] or '-'})")
+
+
+def run_live(sources, threshold_minutes=3, interval=60, output_file=None, is_flexible=True):
+    """
+    实时模式：读取标准输入（sources 为 ["-"]）或跟踪考勤文件，逐条增量更新，
+    每 interval 秒输出一次当前异常快照。标准输入结束或 Ctrl+C 时输出最后一次快照。
+    """
+    tracker = LiveTracker(threshold_minutes, is_flexible)
+    events = queue.Queue()
+    stop = threading.Event()
+
+    from_stdin = sources == ["-"]
+    if from_stdin:
+        threading.Thread(target=_read_stdin, args=(events,), daemon=True).start()
+    else:
+        for file_path in sources:
+            tracker.add_employee(get_employee_name(file_path))
+            threading.Thread(target=_tail_file, args=(file_path, events, stop), daemon=True).start()
+    logger.info(f"实时模式已启动，数据源: {'标准输入' if from_stdin else len(sources)}，快照间隔 {interval} 秒")
+
+    def emit(now):
+        records = tracker.snapshot(now)
+        log_snapshot(records, now)
+        if output_file:
+            write_snapshot(records, now, output_file)
+
+    last_punch = None
+    next_emit = time.monotonic() + interval
+    try:
+        while True:
+            try:
+                event = events.get(timeout=max(0.0, next_emit - time.monotonic()))
+            except queue.Empty:
+                event = ()
+            if event is None:
+                break
+            if event:
+                employee, punch = event
+                tracker.add(employee, punch)
+                last_punch = max(last_punch, punch) if last_punch else punch
+            if time.monotonic() >= next_emit:
+                emit(datetime.datetime.now())
+                next_emit = time.monotonic() + interval
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+
+    # 标准输入回放结束时以最后一次打卡作为当前时间
+    emit(last_punch if from_stdin and last_punch else datetime.datetime.now())
+    return tracker
@@ -1,42 +1,150 @@
-﻿import logging
+﻿import atexit
+import logging
+import multiprocessing
 import os
-from logging.handlers import TimedRotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
 from datetime import datetime
 
-# 获取当前脚本所在的目录
-log_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs')
-
-# 如果日志目录不存在，创建目录
-if not os.path.exists(log_dir):
-    os.makedirs(log_dir)
-
-# 创建日志文件路径
-log_filename = os.path.join(log_dir, f"{datetime.today().strftime('%Y-%m-%d')}.log")
+# 默认日志目录：当前脚本所在目录下的 logs，可通过环境变量 IPCI_LOG_DIR 或 setup_logging 修改
+# 导入本模块时只输出到控制台，由程序入口调用 setup_logging 后才创建日志目录并写文件
+DEFAULT_LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs')
 
 # 创建logger
 logger = logging.getLogger()
 
-# 设置日志的最低级别
-logger.setLevel(logging.DEBUG)
+# 后台写文件的监听线程、其读取的日志队列及当前挂在 logger 上的 handler
+_listener = None
+_log_queue = None
+_handlers = []
+
+
+def _parse_level(level):
+    level = level or os.environ.get("IPCI_LOG_LEVEL") or logging.DEBUG
+    if isinstance(level, str):
+        level = logging.getLevelName(level.upper())
+        if not isinstance(level, int):
+            raise ValueError(f"日志级别无效: {level}")
+    return level
+
+
+def setup_logging(log_dir=None, level=None, to_file=True):
+    """
+    配置日志：业务线程只把日志记录放入队列，由后台监听线程写入文件，避免文件 I/O 阻塞热点路径。
+
+    参数：
+    log_dir (str): 日志目录，默认取环境变量 IPCI_LOG_DIR，再默认为 DEFAULT_LOG_DIR
+    level (str|int): 日志级别，如 "INFO"，默认取环境变量 IPCI_LOG_LEVEL，再默认为 DEBUG
+    to_file (bool): 为 False 时只输出到控制台，不创建日志目录
+    """
+    global _listener, _log_queue, _handlers
+
+    level = _parse_level(level)
+    stop_logging()
+
+    # 设置日志的最低级别
+    logger.setLevel(level)
+
+    # 如果需要将日志同时输出到控制台
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.INFO)  # 控制台只显示 INFO 及以上的日志
+
+    # 控制台输出格式，只输出日志消息内容（没有时间戳、日志级别等前缀）
+    console_formatter = logging.Formatter('%(message)s')
+    console_handler.setFormatter(console_formatter)
+
+    if not to_file:
+        _handlers = [console_handler]
+        logger.addHandler(console_handler)
+        return
+
+    log_dir = log_dir or os.environ.get("IPCI_LOG_DIR") or DEFAULT_LOG_DIR
+
+    # 写入环境变量，使多进程模式下的子进程沿用相同配置
+    os.environ["IPCI_LOG_DIR"] = log_dir
+    os.environ["IPCI_LOG_LEVEL"] = logging.getLevelName(level)
+
+    # 如果日志目录不存在，创建目录
+    if not os.path.exists(log_dir):
+        os.makedirs(log_dir)
+
+    # 创建日志文件路径
+    log_filename = os.path.join(log_dir, f"{datetime.today().strftime('%Y-%m-%d')}.log")
+
+    # 创建一个按时间分割日志的处理器（每天一个新的日志文件）
+    log_handler = TimedRotatingFileHandler(log_filename, when="midnight", interval=1, backupCount=7, encoding='utf-8', delay=True)
+    log_handler.setLevel(level)  # 设置日志级别
+
+    # 日志格式，包含时间、日志级别、文件名、行号和消息（用于文件输出）
+    file_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(filename)s - line %(lineno)d - %(message)s')
+    log_handler.setFormatter(file_formatter)
+
+    # 文件 handler 只交给本进程的后台监听线程；控制台仍同步输出，保证与 print 的先后顺序。
+    # 队列可跨进程使用，进程池的工作进程也把日志放入该队列，日志文件始终只有一个写入方，
+    # 避免多个进程同时打开同一个按天滚动的文件（Windows 下滚动时会因文件被占用而失败）
+    _log_queue = multiprocessing.Queue()
+    _listener = QueueListener(_log_queue, log_handler, respect_handler_level=True)
+    _listener.start()
+    # multiprocessing 在创建队列时才注册自己的退出处理（会关闭队列的写入端），
+    # 重新注册使 stop_logging 先于它执行，否则监听线程会在写完剩余日志前读到 EOF
+    atexit.unregister(stop_logging)
+    atexit.register(stop_logging)
+    _handlers = [QueueHandler(_log_queue), console_handler]
+
+    for handler in _handlers:
+        logger.addHandler(handler)
+
+
+def get_log_queue():
+    """主进程的日志队列，传给进程池的 init_worker_logging；未写日志文件时为 None"""
+    return _log_queue
+
+
+def init_worker_logging(log_queue=None):
+    """
+    进程池工作进程的初始化函数：丢弃从主进程继承的 handler（不停止不属于本进程的监听线程），
+    日志放入主进程的队列，由主进程的监听线程写入文件；log_queue 为 None 时只输出到控制台。
+
+    参数：
+    log_queue: get_log_queue() 的返回值，通过 ProcessPoolExecutor 的 initargs 传入
+    """
+    global _listener, _log_queue, _handlers
+
+    for handler in _handlers:
+        logger.removeHandler(handler)
+    _listener, _log_queue, _handlers = None, None, []
+
+    logger.setLevel(_parse_level(None))
+
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.INFO)
+    console_handler.setFormatter(logging.Formatter('%(message)s'))
+    _handlers = [console_handler]
+    if log_queue is not None:
+        _handlers.insert(0, QueueHandler(log_queue))
+
+    for handler in _handlers:
+        logger.addHandler(handler)
 
-# 创建一个按时间分割日志的处理器（每天一个新的日志文件）
-log_handler = TimedRotatingFileHandler(log_filename, when="midnight", interval=1, backupCount=7, encoding='utf-8')
-log_handler.setLevel(logging.DEBUG)  # 设置日志级别
 
-# 日志格式，包含时间、日志级别、文件名、行号和消息（用于文件输出）
-file_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(filename)s - line %(lineno)d - %(message)s')
-log_handler.setFormatter(file_formatter)
+def stop_logging():
+    """停止后台监听线程（会先写完队列中剩余的日志）并移除 handler"""
+    global _listener, _log_queue, _handlers
 
-# 将 handler 添加到 logger
-logger.addHandler(log_handler)
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+    if _log_queue is not None:
+        _log_queue.close()
+        _log_queue = None
 
-# 如果需要将日志同时输出到控制台
-console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.INFO)  # 控制台只显示 INFO 及以上的日志
+    for handler in _handlers:
+        logger.removeHandler(handler)
+        if not isinstance(handler, QueueHandler):
+            handler.close()
+    _handlers = []
 
-# 控制台输出格式，只输出日志消息内容（没有时间戳、日志级别等前缀）
-console_formatter = logging.Formatter('%(message)s')
-console_handler.setFormatter(console_formatter)
 
-# 将控制台 handler 添加到 logger
-logger.addHandler(console_handler)
+setup_logging(to_file=False)
+atexit.register(stop_logging)
@@ -5,82 +5,142 @@ import sys
 import subprocess
 import openpyxl
 import argparse
+import multiprocessing
 from collections import defaultdict
 from attendanceManager import AttendanceManager
-from log_config import logger
+from log_config import logger, setup_logging
 from parse import *
 import cmd
 from utils import *
 from cmdcli import *
+from shard import SHARD_MODES, process_sharded
+from extsort import external_sort, iter_days
+from service import serve
+from exporter import OUTPUT_FORMATS, export_text, get_output_files
+from checkpoint import Journal, unit_key
+from sweep import process_sweep
+from live import run_live
+from memguard import MB, MemoryMonitor, measure, plan_memory
 
 
 # 工作目录
 project_dir = ""
 
 
-# 获取中文星期
-def get_weekday_chinese(date_str):
-    date = datetime.strptime(date_str, "%Y-%m-%d").date()
-    weekday_num = date.weekday()  # 返回0=Monday, 1=Tuesday, ..., 6=Sunday
-    weekday_chinese = ["周一", "周二", "周三", "周四", "周五", "周六", "周日"]
-    return weekday_chinese[weekday_num]
-
-# 生成并保存 Excel 文件
-def generate_excel_file(wb, final_attendance_data):
-    # 删除默认的工作表
-    if 'Sheet' in wb.sheetnames:
-        del wb['Sheet']
-
-    # 创建一个工作表名为 "src"
-    ws = wb.create_sheet(title="src")
-
-    # 写入表头
-    ws.append(["日期", "星期", "打卡时间1", "打卡时间2", "打卡时间3", "打卡时间4"])  # 可根据最大打卡次数调整
-
-    # 遍历最终考勤数据
-    sorted_dates = sorted(final_attendance_data.keys())
-    for date in sorted_dates:
-        weekday = get_weekday_chinese(date)
-        formatted_times = [time.split(" ")[1] for time in final_attendance_data[date]]  # 取出时分秒部分
-
-        # 将同一天的打卡时间写入同一行，每个时间占据一个单元格
-        row = [date, weekday] + formatted_times
-
-        # 补齐空白单元格以保证每一行的列数一致（假设最多有5次打卡）
-        while len(row) < 7:  # 确保每行至少有6列（日期、星期及5个打卡时间）
-            row.append('')
-
-        ws.append(row)
+def process_file(file_path, year, month, threshold_minutes, is_debug, memory_budget=None, formats=("xlsx",),
+                 snapshot=None, output_file=None, monitor=None, write_only=False):
+    global project_dir
 
+    # 支持传入多台考勤机的导出文件列表，输出文件以第一个文件命名
+    file_paths = [file_path] if isinstance(file_path, str) else list(file_path)
+    file_path = file_paths[0]
+    employee = get_employee_name(file_path)
+
+    if len(file_paths) > 1:
+        # 多考勤机：各文件已按时间排序，流式 k 路归并并跨机去重（读取与过滤在同一阶段完成）
+        with measure(monitor, "ingest"):
+            filter_dict = merge_files(file_paths, year, month, threshold_minutes)
+    elif memory_budget:
+        # 内存受限模式：只保留目标月份的打卡，超出预算时分段写入临时文件再归并，
+        # 过滤阶段按日期顺序惰性消费，峰值内存与输入文件大小无关
+        with measure(monitor, "ingest"):
+            month_prefix = f"{year:04d}-{month:02d}-"
+            punches = (p for p in iter_punches(file_path) if p.startswith(month_prefix))
+            day_stream = iter_days(external_sort(punches, memory_budget))
+            filter_dict = dict(iter_filter_times(day_stream, year, month, threshold_minutes))  # 至多一个月的数据
+    else:
+        with measure(monitor, "ingest"):
+            src_dict = convert_file(file_path)
+        if(is_debug):
+            save_debug_data(src_dict, project_dir, "convert")
+        if snapshot:
+            snapshot.save(src_dict, "convert", employee)
 
-def process_file(file_path, year, month, threshold_minutes, is_debug):
-    global project_dir
+        if src_dict is None:
+            raise ValueError(f"解析失败: {file_path}")
 
-    src_dict = convert_file(file_path)
-    if(is_debug):
-        save_debug_data(src_dict, project_dir, "convert")
+        with measure(monitor, "filter"):
+            filter_dict = filter_times(src_dict, year, month, threshold_minutes)
+            del src_dict  # 后续阶段不再需要整份原始数据
 
-    filter_dict = filter_times(src_dict, year, month, threshold_minutes)
     if(is_debug):
         save_debug_data(filter_dict, project_dir, "filter")
-
-    # 写入
-    # 创建 Excel 工作簿
-    wb = openpyxl.Workbook()
-
-    # 生成 Excel 文件
-    generate_excel_file(wb, filter_dict)
+    if snapshot:
+        snapshot.save(filter_dict, "filter", employee)
+        snapshot.diff("convert", "filter", employee)  # filter_times 去掉的打卡
 
     # 设置输出文件路径
-    output_file = file_path.replace(".txt", ".xlsx")
+    output_file = output_file or get_output_path(file_path)
     
     # 假设 attendance_manager 是一个有效的对象，并调用它来处理考勤数据
-    attendance_manager = AttendanceManager(year, is_flexible=True)
-    result = attendance_manager.process_month(month, filter_dict)
-    attendance_manager.write_attendance_to_excel(wb, result)
-
-    wb.save(output_file)
-    logger.info(f"数据已保存为：{output_file}")
+    with measure(monitor, "classify"):
+        attendance_manager = AttendanceManager(year, is_flexible=True)
+        result = attendance_manager.process_month(month, filter_dict)
+
+    # CSV/JSONL 直接从结果流式写出，不经过 openpyxl
+    if any(fmt != "xlsx" for fmt in formats):
+        with measure(monitor, "export"):
+            for text_file in export_text(os.path.splitext(output_file)[0], formats, attendance_manager, filter_dict, result):
+                logger.info(f"数据已保存为：{text_file}")
+
+    if "xlsx" in formats:
+        # 写入
+        with measure(monitor, "build"):
+            # 创建 Excel 工作簿（只写模式逐行写出，不在内存中保留整张表）
+            wb = openpyxl.Workbook(write_only=write_only)
+
+            # 生成 Excel 文件
+            generate_excel_file(wb, filter_dict, attendance_manager)
+            attendance_manager.write_attendance_to_excel(wb, result)
+
+        with measure(monitor, "save"):
+            wb.save(output_file)
+        logger.info(f"数据已保存为：{output_file}")
+
+    return result
+
+
+def process_batch(files, year, months, threshold_minutes, formats, output_dir, journal_path, resume=False):
+    """
+    批量处理 文件 × 月份 的所有单元，每个单元完成后写入检查点。
+    单个单元失败不会中断整批；resume 时跳过已完成的单元，只处理失败或缺失的单元。
+    """
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    journal = Journal(journal_path, resume)
+
+    # 不同目录下的同名文件输出时加上相对路径，避免互相覆盖
+    labels = get_employee_labels(files)
+
+    counts = {"done": 0, "skipped": 0, "failed": 0}
+    for file_path in files:
+        for month in months:
+            try:
+                unit = unit_key([file_path], year, [month], threshold_minutes, ",".join(formats))
+            except OSError as e:
+                # 文件在展开后被删除或无法访问，只记为该单元失败
+                logger.error(f"处理失败,文件:{file_path},月份:{month},异常:{e}")
+                journal.record_failed(f"{os.path.abspath(file_path)}|{year}:{month}:tm={threshold_minutes}", e)
+                counts["failed"] += 1
+                continue
+            if journal.is_done(unit):
+                counts["skipped"] += 1
+                continue
+
+            output_file = os.path.join(output_dir, f"{labels[file_path]}-{year}{month:02d}.xlsx")
+            try:
+                process_file(file_path, year, month, threshold_minutes, False, formats=formats, output_file=output_file)
+            except Exception as e:
+                logger.error(f"处理失败,文件:{file_path},月份:{month},异常:{e}")
+                journal.record_failed(unit, e)
+                counts["failed"] += 1
+                continue
+
+            journal.record_done(unit, get_output_files(output_file, formats))
+            counts["done"] += 1
+
+    logger.info(f"批量处理结束: 完成 {counts['done']}, 跳过 {counts['skipped']}, 失败 {counts['failed']}, 检查点: {journal_path}")
+    return counts
 
 
 def main():
@@ -90,6 +150,13 @@ def main():
     VER = "V2.0"
     DATE = "20250224"
 
+    # 日志参数需要在输出第一条日志之前生效；导入时只输出到控制台，这里才开始写日志文件
+    log_parser = argparse.ArgumentParser(add_help=False)
+    log_parser.add_argument('--log-dir')
+    log_parser.add_argument('--log-level')
+    log_args, _ = log_parser.parse_known_args()
+    setup_logging(log_args.log_dir, log_args.log_level)
+
     # 判断是否是 Nuitka 打包环境
     is_packaged = not hasattr(sys, "_MEIPASS") and not os.path.exists(__file__)
 
@@ -127,11 +194,44 @@ def main():
         parser.add_argument('month', nargs='?', type=int, help="月份")  # 可选参数
         parser.add_argument('--tm', type=int, help="设置时间阈值，单位分钟", default=3)  # 可选带参参数
         parser.add_argument('--debug', action='store_true', help="开启调试模式，传入 --debug 开启调试")
+        parser.add_argument('--snapshot', action='store_true', help="调试快照：按次运行分目录，逐阶段写出压缩 JSONL 及阶段差异")
+        parser.add_argument('--sample-dates', help="调试快照只保留这些日期，逗号分隔，如 2025-02-03,2025-02-12")
+        parser.add_argument('--sample-employees', help="调试快照只保留这些员工（文件名），逗号分隔")
+        parser.add_argument('--format', nargs='+', choices=OUTPUT_FORMATS, default=["xlsx"], help="输出格式，可同时指定多个，默认 xlsx")
+        parser.add_argument('--merge', nargs='+', default=[], metavar='FILE', help="同一周期内其他考勤机的导出文件，与 file_path 归并处理")
+        parser.add_argument('--mem-budget', type=int, help="内存预算(MB)，设置后按外部排序流式处理，适用于超大导出文件")
+        parser.add_argument('--mem-report', action='store_true', help="内存报告：记录各阶段的峰值分配(tracemalloc)与 RSS")
+        parser.add_argument('--max-memory', type=int, help="内存上限(MB)：预计超出时自动改为流式读取和只写工作簿，无法满足时直接报错")
+        parser.add_argument('--analytics', action='store_true', help="分布统计：上下班时间、午休、加班的百分位/直方图/按月趋势（员工、组及全体），需要 numpy")
+        parser.add_argument('--sweep-tm', help="参数对比：逗号分隔的多个过滤阈值，如 1,3,5，同时对比弹性/固定两种规则")
+        parser.add_argument('--shard', choices=SHARD_MODES, help="分片输出：按员工(employee)或月份(month)拆分为多个工作簿并行生成")
+        parser.add_argument('--input-exts', default="txt", help="目录输入时读取的文件类型，逗号分隔，如 txt,csv,xlsx，默认 txt")
+        parser.add_argument('--shard-size', type=int, default=1, help="按员工分片时每个工作簿包含的员工数，默认 1")
+        parser.add_argument('--months', help="分片/批量输出的月份列表，如 1-3,5，默认为 month 参数")
+        parser.add_argument('--workers', type=int, help="并行进程数（服务模式下为工作线程数），默认按 CPU 核数")
+        parser.add_argument('--output-dir', help="分片/批量输出目录，默认为考勤文件所在目录")
+        parser.add_argument('--journal', help="批量处理的检查点文件，默认为输出目录下的 checkpoint.jsonl")
+        parser.add_argument('--resume', action='store_true', help="从检查点续跑，跳过已完成的单元")
+        parser.add_argument('--log-dir', help="日志目录，默认为程序所在目录下的 logs")
+        parser.add_argument('--log-level', default=None, help="日志级别 DEBUG/INFO/WARNING/ERROR，默认 DEBUG")
+        parser.add_argument('--live', action='store_true', help="实时模式：file_path 为 - 时读取标准输入（每行: 员工 打卡时间），否则跟踪文件/目录下持续增长的导出")
+        parser.add_argument('--interval', type=int, default=60, help="实时模式输出快照的间隔（秒），默认 60")
+        parser.add_argument('--serve', action='store_true', help="以本地 HTTP 服务方式常驻运行")
+        parser.add_argument('--host', default="127.0.0.1", help="服务监听地址，默认 127.0.0.1")
+        parser.add_argument('--port', type=int, default=8765, help="服务监听端口，默认 8765")
 
         args = parser.parse_args()
 
+        # 服务模式：常驻进程，缓存保持热状态
+        if args.serve:
+            serve(args.host, args.port, args.workers)
+        # 实时模式：增量更新，定时输出当前异常快照
+        elif args.live and args.file_path:
+            sources = ["-"] if args.file_path == "-" else expand_inputs(
+                args.file_path, tuple(f".{ext.strip('.')}" for ext in args.input_exts.split(",")))
+            run_live(sources, args.tm, args.interval, os.path.join(args.output_dir or project_dir, "live.json"))
         # 如果没有命令行参数，则进入交互界面并显示帮助
-        if not args.file_path:
+        elif not args.file_path:
             logger.info("进入命令行交互模式... (输入 help 获取更多命令信息)")
             IPCiCmd(project_dir).cmdloop()  # 启动交互式命令行界面
         else:
@@ -143,9 +243,61 @@ def main():
             threshold_minutes = args.tm
 
 
-            logger.debug(f"文件路径: {input_file_path}, 年份: {year}, 月份: {month}, 过滤阈值: {threshold_minutes}, 调试模式: {is_debug}")
+            logger.debug("文件路径: %s, 年份: %s, 月份: %s, 过滤阈值: %s, 调试模式: %s",
+                         input_file_path, year, month, threshold_minutes, is_debug)
             
-            process_file(input_file_path, year, month, threshold_minutes, is_debug)
+            if args.analytics:
+                # 分布统计：目录下每个考勤文件视为一名员工，所在目录名为组名；未指定月份时统计全年
+                from analytics import run_analytics  # numpy 只在统计时需要
+                files = expand_inputs(input_file_path, tuple(f".{ext.strip('.')}" for ext in args.input_exts.split(",")))
+                months = parse_months(args.months) if args.months else ([month] if month else list(range(1, 13)))
+                output_dir = args.output_dir or (input_file_path if os.path.isdir(input_file_path)
+                                                 else os.path.dirname(os.path.abspath(input_file_path)))
+                run_analytics(files, year, months, threshold_minutes, output_dir)
+            elif args.sweep_tm:
+                # 参数对比：解析一次，评估多组阈值及弹性设置
+                thresholds = [int(tm) for tm in args.sweep_tm.split(",") if tm.strip()]
+                output_file = os.path.splitext(get_output_path(input_file_path))[0] + ".sweep.xlsx"
+                process_sweep(input_file_path, year, month, thresholds, output_file)
+            elif args.shard or args.months or args.resume or os.path.isdir(input_file_path):
+                # 分片/批量输出：file_path 可以是目录，目录下每个考勤文件视为一名员工
+                files = expand_inputs(input_file_path, tuple(f".{ext.strip('.')}" for ext in args.input_exts.split(",")))
+                months = parse_months(args.months) if args.months else [month]
+                output_dir = args.output_dir or (input_file_path if os.path.isdir(input_file_path)
+                                                 else os.path.dirname(os.path.abspath(input_file_path)))
+                journal_path = args.journal or os.path.join(output_dir, "checkpoint.jsonl")
+                if args.shard:
+                    process_sharded(files, year, months, threshold_minutes, args.shard, args.shard_size,
+                                    args.workers, output_dir, journal_path, args.resume)
+                else:
+                    process_batch(files, year, months, threshold_minutes, args.format, output_dir,
+                                  journal_path, args.resume)
+            else:
+                memory_budget = args.mem_budget * 1024 * 1024 if args.mem_budget else None
+                input_files = [input_file_path] + args.merge
+                snapshot = None
+                if args.snapshot:
+                    snapshot = DebugSnapshot(project_dir,
+                                             args.sample_dates.split(",") if args.sample_dates else None,
+                                             args.sample_employees.split(",") if args.sample_employees else None)
+
+                monitor = None
+                write_only = False
+                if args.mem_report or args.max_memory:
+                    max_memory = args.max_memory * MB if args.max_memory else None
+                    monitor = MemoryMonitor(args.mem_report, max_memory)
+                    if max_memory:
+                        # 按输入大小预估，超出上限时改走流式读取与只写工作簿，无法满足时直接报错
+                        plan = plan_memory(input_files, max_memory, monitor.baseline)
+                        memory_budget = memory_budget or plan["memory_budget"]
+                        write_only = plan["write_only"]
+                try:
+                    process_file(input_files, year, month, threshold_minutes, is_debug, memory_budget, args.format,
+                                 snapshot, monitor=monitor, write_only=write_only)
+                finally:
+                    if monitor:
+                        monitor.log()
+                        monitor.stop()
             
     except Exception as e:
         logger.error(f"发生错误: {e}")
@@ -153,5 +305,6 @@ def main():
 
 # 主函数，传入文件路径
 if __name__ == "__main__":    
+    multiprocessing.freeze_support()  # 打包环境下多进程需要
     main()
 
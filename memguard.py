@@ -0,0 +1,180 @@
+import gzip
+import os
+import struct
+import sys
+import time
+import tracemalloc
+import zipfile
+from contextlib import contextmanager, nullcontext
+from log_config import logger
+
+MB = 1024 * 1024
+# 一次性读取解析时峰值内存约为输入（解压后）大小的倍数（含整文件解码、正则结果和按日期分组的字典）
+FULL_PATH_FACTOR = 16
+# 流式处理的固定开销（编码识别、单月数据、结果及工作簿），外部排序缓冲区另计
+STREAM_OVERHEAD = 24 * MB
+# 外部排序缓冲区的估算值与实际占用之比
+STREAM_BUDGET_FACTOR = 2
+# 流式处理的外部排序缓冲区上下限
+MIN_STREAM_BUDGET = 1 * MB
+MAX_STREAM_BUDGET = 64 * MB
+
+# get_rss 读到过的最大 RSS
+_rss_peak = 0
+
+
+def get_rss():
+    """
+    当前进程的常驻内存及峰值（字节）。
+
+    返回：
+    tuple: (当前, 峰值)，无法获取的项为 None
+    """
+    global _rss_peak
+
+    try:
+        if sys.platform == "win32":
+            import ctypes
+            from ctypes import wintypes
+
+            class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+                _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                            ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                            ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+            counters = PROCESS_MEMORY_COUNTERS()
+            counters.cb = ctypes.sizeof(counters)
+            ctypes.windll.psapi.GetProcessMemoryInfo(ctypes.windll.kernel32.GetCurrentProcess(),
+                                                     ctypes.byref(counters), counters.cb)
+            return counters.WorkingSetSize, counters.PeakWorkingSetSize
+
+        if os.path.exists("/proc/self/status"):
+            # 当前值与峰值从同一处读取，避免两个来源的统计口径不同导致当前值大于峰值
+            values = {}
+            with open("/proc/self/status") as file:
+                for line in file:
+                    key, _, value = line.partition(":")
+                    if key in ("VmRSS", "VmHWM"):
+                        values[key] = int(value.split()[0]) * 1024  # 单位为 kB
+            if "VmRSS" in values and "VmHWM" in values:
+                # 内核的计数按批同步，VmHWM 可能略低于之前读到的 VmRSS，峰值取历次读数的最大值
+                _rss_peak = max(_rss_peak, values["VmHWM"], values["VmRSS"])
+                return values["VmRSS"], _rss_peak
+
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak = peak if sys.platform == "darwin" else peak * 1024  # Linux 单位为 KB
+        return None, peak
+    except Exception as e:
+        logger.debug("获取进程内存失败,异常:%s", e)
+        return None, None
+
+
+def estimate_input_bytes(file_path):
+    """估算输入解压后的大小：.gz 读取尾部记录的原始长度，.zip 累加各成员大小，其他为文件大小"""
+    ext = os.path.splitext(file_path)[1].lower()
+    try:
+        if ext == ".gz":
+            with open(file_path, 'rb') as file:
+                file.seek(-4, os.SEEK_END)
+                size = struct.unpack("<I", file.read(4))[0]  # 原始长度对 2^32 取模
+            return max(size, os.path.getsize(file_path))
+        if ext == ".zip":
+            with zipfile.ZipFile(file_path) as archive:
+                return sum(info.file_size for info in archive.infolist())
+    except (OSError, zipfile.BadZipFile, struct.error, gzip.BadGzipFile) as e:
+        logger.warning(f"无法读取压缩包大小,按文件大小估算,文件:{file_path},异常:{e}")
+    return os.path.getsize(file_path)
+
+
+def _mb(value):
+    return "-" if value is None else f"{value / MB:.1f}"
+
+
+def plan_memory(file_paths, max_memory, baseline=None):
+    """
+    根据输入大小选择不超过内存上限的处理方式。
+
+    参数：
+    file_paths (list): 输入文件，多个文件时本身就是流式归并
+    max_memory (int): 内存上限（字节）
+    baseline (int): 当前已占用的内存，默认读取进程 RSS
+
+    返回：
+    dict: {"memory_budget": 外部排序预算（None 表示一次性读取）, "write_only": 是否使用只写工作簿}
+
+    异常：
+    MemoryError: 任何处理方式都无法控制在上限内
+    """
+    if baseline is None:
+        baseline = get_rss()[0] or 0
+    available = max_memory - baseline
+
+    input_bytes = sum(estimate_input_bytes(f) for f in file_paths)
+    predicted = input_bytes * FULL_PATH_FACTOR
+    if len(file_paths) == 1 and predicted <= available:
+        logger.info(f"内存预估: 输入 {_mb(input_bytes)}MB, 一次性读取约需 {_mb(predicted)}MB, 可用 {_mb(available)}MB")
+        return {"memory_budget": None, "write_only": False}
+
+    budget = min(MAX_STREAM_BUDGET, (available - STREAM_OVERHEAD) // STREAM_BUDGET_FACTOR)
+    if budget < MIN_STREAM_BUDGET:
+        raise MemoryError(f"内存上限 {_mb(max_memory)}MB 不足：当前已占用 {_mb(baseline)}MB，"
+                          f"流式处理至少还需 {_mb(STREAM_OVERHEAD + MIN_STREAM_BUDGET * STREAM_BUDGET_FACTOR)}MB")
+
+    logger.info(f"内存预估: 输入 {_mb(input_bytes)}MB, 一次性读取约需 {_mb(predicted)}MB, 可用 {_mb(available)}MB, "
+                f"改为流式读取（排序缓冲 {_mb(budget)}MB）并使用只写工作簿")
+    return {"memory_budget": budget, "write_only": True}
+
+
+class MemoryMonitor:
+    """
+    按阶段记录内存：tracemalloc 跟踪的峰值分配（trace 为 True 时）及阶段结束时的 RSS。
+    设置 max_memory 时每个阶段结束后检查 RSS，超过上限立即抛出 MemoryError。
+    """
+
+    def __init__(self, trace=False, max_memory=None):
+        self.trace = trace
+        self.max_memory = max_memory
+        self.stages = []  # [{"stage", "seconds", "traced_peak", "rss", "rss_peak"}, ...]
+        self.baseline = get_rss()[0]
+        if trace and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name):
+        if self.trace:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            rss, rss_peak = get_rss()
+            self.stages.append({
+                "stage": name,
+                "seconds": time.perf_counter() - start,
+                "traced_peak": tracemalloc.get_traced_memory()[1] if self.trace else None,
+                "rss": rss,
+                "rss_peak": rss_peak,
+            })
+
+        current = rss if rss is not None else rss_peak
+        if self.max_memory and current is not None and current > self.max_memory:
+            raise MemoryError(f"阶段 {name} 结束后内存 {_mb(current)}MB 超过上限 {_mb(self.max_memory)}MB，已停止处理")
+
+    def log(self):
+        logger.info(f"内存报告（MB），起始 RSS {_mb(self.baseline)}:")
+        logger.info(f"  {'阶段':<10}{'耗时(秒)':>10}{'分配峰值':>10}{'RSS':>10}{'RSS峰值':>10}")
+        for s in self.stages:
+            logger.info(f"  {s['stage']:<10}{s['seconds']:>10.2f}{_mb(s['traced_peak']):>10}"
+                        f"{_mb(s['rss']):>10}{_mb(s['rss_peak']):>10}")
+
+    def stop(self):
+        if self.trace:
+            tracemalloc.stop()
+
+
+def measure(monitor, name):
+    """monitor 为 None 时不做任何记录"""
+    return monitor.stage(name) if monitor else nullcontext()
@@ -1,38 +1,236 @@
 ﻿from collections import defaultdict
+import csv
+import gzip
+import heapq
+import io
+import os
 import re
+import zipfile
+import openpyxl
 from log_config import logger
-from datetime import datetime, timedelta
+from extsort import iter_days
+from datetime import datetime, time as dt_time, timedelta
 import chardet
 
+def convert_bytes(raw_data):
+    """解析考勤文件的原始字节内容，返回 {日期: [打卡时间, ...]}"""
+    # 自动识别文件编码
+    result = chardet.detect(raw_data)
+    encoding = result['encoding']
+
+    # 使用识别的编码解码
+    content = raw_data.decode(encoding)
+
+    # 使用正则表达式提取所有日期和时间
+    pattern = r'(\d{4}-\d{2}-\d{2}) (\d{2}:\d{2}:\d{2})'
+    matches = re.findall(pattern, content)
+
+    # 使用 defaultdict 来存储数据
+    attendance_data = defaultdict(list)
+
+    # 将匹配的日期和时间存储到字典中，确保时间包含年月日
+    for date, time in matches:
+        datetime_str = f"{date} {time}"
+        attendance_data[date].append(datetime_str)
+
+    return attendance_data
+
 def convert_file(file_path):
     try:
-        # 自动识别文件编码
+        if os.path.splitext(file_path)[1].lower() != ".txt":
+            # 非 txt 导出：流式逐行读取，直接汇总为按日期分组的字典
+            return _group_by_date(iter_punches(file_path))
+
         with open(file_path, 'rb') as file:
             raw_data = file.read()
-            result = chardet.detect(raw_data)
-            encoding = result['encoding']
-        
-        # 使用识别的编码打开文件
-        with open(file_path, 'r', encoding=encoding) as file:
-            content = file.read()
-
-            # 使用正则表达式提取所有日期和时间
-            pattern = r'(\d{4}-\d{2}-\d{2}) (\d{2}:\d{2}:\d{2})'
-            matches = re.findall(pattern, content)
-
-            # 使用 defaultdict 来存储数据
-            attendance_data = defaultdict(list)
-
-            # 将匹配的日期和时间存储到字典中，确保时间包含年月日
-            for date, time in matches:
-                datetime_str = f"{date} {time}"
-                attendance_data[date].append(datetime_str)
 
-            return attendance_data
+        return convert_bytes(raw_data)
 
     except Exception as e:
         logger.error(f"解析出错,文件:{file_path},异常:{e}")
     
+# 流式读取时用于识别编码的前缀字节数
+ENCODING_SNIFF_BYTES = 64 * 1024
+
+# 支持的考勤导出格式（.gz/.zip 为压缩包，内部文件仍为以上格式）
+INPUT_EXTS = (".txt", ".csv", ".xlsx", ".gz", ".zip")
+
+PUNCH_PATTERN = re.compile(r'(\d{4}-\d{2}-\d{2}) (\d{2}:\d{2}:\d{2})')
+
+def _detect_encoding(file):
+    """用文件开头的一段内容识别编码，读取后回到文件开头"""
+    encoding = chardet.detect(file.read(ENCODING_SNIFF_BYTES))['encoding'] or 'utf-8'
+    file.seek(0)
+    return encoding
+
+def _iter_line_punches(lines):
+    for line in lines:
+        for match in PUNCH_PATTERN.finditer(line):
+            yield f"{match.group(1)} {match.group(2)}"
+
+def _iter_text_punches(file):
+    """文本导出：逐行用正则提取日期时间"""
+    # 只提取 ASCII 的日期时间，个别无法解码的字节（如前缀之后才出现的中文）替换即可
+    text = io.TextIOWrapper(file, encoding=_detect_encoding(file), errors='replace')
+    yield from _iter_line_punches(text)
+
+def _iter_csv_punches(file):
+    """CSV 导出：逐行读取，同一行的各列以空格拼接后提取，兼容日期与时间分列的情况"""
+    text = io.TextIOWrapper(file, encoding=_detect_encoding(file), errors='replace', newline='')
+    sample = text.read(ENCODING_SNIFF_BYTES)
+    text.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t|")
+    except csv.Error:
+        dialect = csv.excel
+    yield from _iter_line_punches(" ".join(row) for row in csv.reader(text, dialect))
+
+TIME_TEXT_PATTERN = re.compile(r'\d{2}:\d{2}:\d{2}')
+
+def _is_time_cell(value):
+    return isinstance(value, dt_time) or (isinstance(value, str) and TIME_TEXT_PATTERN.match(value.strip()) is not None)
+
+def _cell_to_text(value, next_value=None):
+    """
+    单元格转为文本。日期格式的单元格读出为零点的 datetime，后一列是时间时只保留日期，
+    与时间拼成 "YYYY-MM-DD HH:MM:SS"，否则零点会被当成打卡时间而丢失真正的时间。
+    """
+    if isinstance(value, datetime):
+        if value.time() == dt_time(0) and _is_time_cell(next_value):
+            return value.strftime("%Y-%m-%d")
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, dt_time):
+        return value.strftime("%H:%M:%S")
+    if hasattr(value, "isoformat"):  # date
+        return value.isoformat()
+    return "" if value is None else str(value)
+
+def _row_to_text(row):
+    return " ".join(_cell_to_text(v, row[i + 1] if i + 1 < len(row) else None) for i, v in enumerate(row))
+
+def _iter_xlsx_punches(file):
+    """xlsx 导出：只读模式逐行读取所有工作表，不会一次性加载整个工作表"""
+    wb = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        for ws in wb.worksheets:
+            rows = ws.iter_rows(values_only=True)
+            yield from _iter_line_punches(_row_to_text(row) for row in rows)
+    finally:
+        wb.close()
+
+# 扩展名 -> 读取函数
+PUNCH_READERS = {
+    ".txt": _iter_text_punches,
+    ".csv": _iter_csv_punches,
+    ".xlsx": _iter_xlsx_punches,
+}
+
+def detect_format(file, name):
+    """按扩展名确定导出格式；扩展名未知时根据文件内容判断（xlsx 为 zip 包，含分隔符的按 CSV）"""
+    ext = os.path.splitext(name)[1].lower()
+    if ext in PUNCH_READERS:
+        return ext
+
+    head = file.read(ENCODING_SNIFF_BYTES)
+    file.seek(0)
+    if head.startswith(b"PK\x03\x04"):
+        return ".xlsx"
+    try:
+        csv.Sniffer().sniff(head.decode(chardet.detect(head)['encoding'] or 'utf-8', errors='replace'),
+                            delimiters=",;|")
+        return ".csv"
+    except csv.Error:
+        return ".txt"
+
+def _iter_file_punches(file, name):
+    reader = PUNCH_READERS[detect_format(file, name)]
+    yield from reader(file)
+
+def _detect_archive(file, name):
+    """按扩展名识别 .gz/.zip 压缩包；扩展名未知时根据文件头判断（xlsx 也是 zip 包，含 [Content_Types].xml 的不算压缩包）"""
+    ext = os.path.splitext(name)[1].lower()
+    if ext in (".gz", ".zip") or ext in PUNCH_READERS:
+        return ext
+
+    head = file.read(4)
+    file.seek(0)
+    if head.startswith(b"\x1f\x8b"):
+        return ".gz"
+    if head.startswith(b"PK\x03\x04"):
+        try:
+            with zipfile.ZipFile(file) as archive:
+                if "[Content_Types].xml" not in archive.namelist():
+                    return ".zip"
+        except zipfile.BadZipFile:
+            pass
+        finally:
+            file.seek(0)
+    return ext
+
+def _iter_stream_punches(file, name):
+    """从已打开的二进制流读取打卡时间，.gz 与 .zip（可含多个文件）边解压边解析，不生成临时文件"""
+    archive_type = _detect_archive(file, name)
+    if archive_type == ".gz":
+        inner_name = name[:-3] if name.lower().endswith(".gz") else ""
+        with gzip.open(file, 'rb') as inner:
+            yield from _iter_file_punches(inner, inner_name)
+    elif archive_type == ".zip":
+        with zipfile.ZipFile(file) as archive:
+            for info in archive.infolist():
+                # 跳过目录及 macOS 打包产生的元数据
+                if info.is_dir() or info.filename.startswith("__MACOSX/"):
+                    continue
+                with archive.open(info) as member:
+                    yield from _iter_file_punches(member, info.filename)
+    else:
+        yield from _iter_file_punches(file, name)
+
+def iter_punches(file_path):
+    """
+    流式读取考勤文件，依次产出 "YYYY-MM-DD HH:MM:SS" 格式的打卡时间。
+    支持 txt/csv/xlsx，按扩展名或文件内容选择读取方式，不会把整个文件读入内存。
+    .gz 与 .zip（可含多个文件）边解压边解析，不生成临时文件。
+    """
+    with open(file_path, 'rb') as file:
+        yield from _iter_stream_punches(file, file_path)
+
+def _group_by_date(punches):
+    attendance_data = defaultdict(list)
+    for datetime_str in punches:
+        attendance_data[datetime_str[:10]].append(datetime_str)
+    return attendance_data
+
+def convert_upload(content, name=""):
+    """
+    解析上传的考勤内容，返回 {日期: [打卡时间, ...]}。
+    与本地文件使用相同的读取方式（txt/csv/xlsx 及 .gz/.zip），没有文件名时按内容识别格式。
+
+    参数：
+    content (bytes): 上传的文件内容
+    name (str): 原文件名，可为空
+    """
+    return _group_by_date(_iter_stream_punches(io.BytesIO(content), name))
+
+def _filter_day(times, threshold):
+    """对同一天已排序的打卡时间去重：相邻间隔小于等于阈值的只保留较晚的一次"""
+    # 用于存储过滤后的时间
+    filtered_times = []
+
+    for time in times:
+        if not filtered_times:  # 第一个时间直接加入
+            filtered_times.append(time)
+        else:
+            # 获取当前时间与上一个保留时间的差值
+            if time - filtered_times[-1] <= threshold:
+                # 如果差值小于等于阈值，保留较大的时间
+                # 当前时间小于等于阈值，更新为当前时间中较大的时间
+                filtered_times[-1] = max(filtered_times[-1], time)
+            else:
+                # 否则，保留当前时间
+                filtered_times.append(time)
+
+    return filtered_times
+
 def filter_times(input_dict, year, month, threshold_minutes=3):
     # 设置时间阈值
     threshold = timedelta(minutes=threshold_minutes)
@@ -53,23 +251,55 @@ def filter_times(input_dict, year, month, threshold_minutes=3):
         time_objects = [datetime.strptime(time, "%Y-%m-%d %H:%M:%S") for time in times]
         time_objects.sort()  # 按时间升序排列
         
-        # 用于存储过滤后的时间
-        filtered_times = []
-
-        for time in time_objects:
-            if not filtered_times:  # 第一个时间直接加入
-                filtered_times.append(time)
-            else:
-                # 获取当前时间与上一个保留时间的差值
-                if time - filtered_times[-1] <= threshold:
-                    # 如果差值小于等于阈值，保留较大的时间
-                    # 当前时间小于等于阈值，更新为当前时间中较大的时间
-                    filtered_times[-1] = max(filtered_times[-1], time)
-                else:
-                    # 否则，保留当前时间
-                    filtered_times.append(time)
+        filtered_times = _filter_day(time_objects, threshold)
 
         # 转换回字符串格式并保存到新字典
         filtered_dict[date] = [time.strftime("%Y-%m-%d %H:%M:%S") for time in filtered_times]
 
-    return filtered_dict
\ No newline at end of file
+    return filtered_dict
+
+def iter_filter_times(day_stream, year, month, threshold_minutes=3):
+    """
+    filter_times 的流式版本：输入为按日期升序的 (日期, 当天已排序的打卡时间) 流，
+    逐日产出过滤后的结果。超过指定月份后立即停止读取上游数据。
+    """
+    threshold = timedelta(minutes=threshold_minutes)
+    month_prefix = f"{year:04d}-{month:02d}"
+
+    for date, times in day_stream:
+        if date[:7] < month_prefix:
+            continue
+        if date[:7] > month_prefix:
+            break
+
+        time_objects = [datetime.strptime(time, "%Y-%m-%d %H:%M:%S") for time in times]
+        filtered_times = _filter_day(time_objects, threshold)
+        yield date, [time.strftime("%Y-%m-%d %H:%M:%S") for time in filtered_times]
+
+def _check_ordered(punches, file_path):
+    """校验单个考勤机导出文件按时间升序，k 路归并依赖这一前提"""
+    previous = None
+    for punch in punches:
+        if previous is not None and punch < previous:
+            raise ValueError(f"文件未按时间排序,无法归并:{file_path},{previous} 之后出现 {punch}")
+        previous = punch
+        yield punch
+
+def merge_files(file_paths, year, month, threshold_minutes=3):
+    """
+    合并同一周期内多台考勤机的导出文件。
+
+    每个文件本身已按时间排序，使用堆做流式 k 路归并，不做全局重排序，也不把文件拼接到内存中；
+    归并得到的有序流按日期分组后直接做去重，因此阈值内的重复打卡会跨考勤机合并。
+
+    返回：
+    dict: 与 filter_times 相同结构的字典 {日期: [打卡时间, ...]}
+    """
+    month_prefix = f"{year:04d}-{month:02d}-"
+    streams = [
+        _check_ordered((p for p in iter_punches(path) if p.startswith(month_prefix)), path)
+        for path in file_paths
+    ]
+
+    day_stream = iter_days(heapq.merge(*streams))
+    return dict(iter_filter_times(day_stream, year, month, threshold_minutes))
@@ -0,0 +1,124 @@
+from collections import Counter, defaultdict
+from attendanceManager import AttendanceManager, WorkdayAttendance, NonWorkdayAttendance
+
+# 查询用的状态码 -> 说明
+STATUS_CODES = {
+    "late": "迟到",
+    "early": "早退",
+    "missing": "缺卡",
+    "absent": "缺勤",
+    "abnormal": "异常",
+    "overtime": "加班",
+}
+
+WORKDAY_PERIODS = ["morning_in", "morning_out", "afternoon_in", "afternoon_out"]
+
+
+def get_status_codes(data):
+    """提取单日考勤结果包含的状态码"""
+    codes = set()
+    if data == "缺勤":
+        codes.add("absent")
+    elif isinstance(data, WorkdayAttendance):
+        statuses = {getattr(data, period)["status"] for period in WORKDAY_PERIODS}
+        if "迟到" in statuses:
+            codes.add("late")
+        if "早退" in statuses:
+            codes.add("early")
+        if "缺卡" in statuses:
+            codes.add("missing")
+    elif isinstance(data, NonWorkdayAttendance):
+        if data.status == "缺卡":
+            codes.add("missing")
+
+    status = AttendanceManager.get_status(data)
+    if status == "异常":
+        codes.add("abnormal")
+    elif "加班" in status:
+        codes.add("overtime")
+    return codes
+
+
+class ResultIndex:
+    """已处理考勤结果的内存索引，按日期、状态码和员工建立二级索引，查询无需重新运行流程"""
+
+    def __init__(self):
+        self.records = {}  # 记录ID -> 记录
+        self.by_date = defaultdict(set)
+        self.by_code = defaultdict(set)
+        self.by_employee = defaultdict(set)
+        self.next_id = 0
+
+    def __len__(self):
+        return len(self.records)
+
+    def _remove(self, record_id):
+        record = self.records.pop(record_id)
+        self.by_date[record["date"]].discard(record_id)
+        self.by_employee[record["employee"]].discard(record_id)
+        for code in record["codes"]:
+            self.by_code[code].discard(record_id)
+
+    def add(self, employee, attendance_data):
+        """
+        加入一名员工的 process_month 结果，同一员工同一日期的旧记录会被替换。
+
+        参数：
+        employee (str): 员工标识
+        attendance_data (dict): process_month 返回的 {日期: 考勤结果}
+        """
+        existing = {self.records[i]["date"]: i for i in self.by_employee.get(employee, ())}
+        for date_str, data in attendance_data.items():
+            if date_str in existing:
+                self._remove(existing[date_str])
+
+            record_id = self.next_id
+            self.next_id += 1
+            record = {
+                "employee": employee,
+                "date": date_str,
+                "status": AttendanceManager.get_status(data),
+                "codes": get_status_codes(data),
+                "overtime_hours": getattr(data, "overtime_hours", 0) or 0,
+                "data": data,
+            }
+            self.records[record_id] = record
+            self.by_date[date_str].add(record_id)
+            self.by_employee[employee].add(record_id)
+            for code in record["codes"]:
+                self.by_code[code].add(record_id)
+
+    def query(self, code=None, date=None, employee=None):
+        """按状态码/日期/员工组合查询，返回按日期、员工排序的记录列表"""
+        candidates = []
+        if code is not None:
+            candidates.append(self.by_code.get(code, set()))
+        if date is not None:
+            candidates.append(self.by_date.get(date, set()))
+        if employee is not None:
+            candidates.append(self.by_employee.get(employee, set()))
+
+        if candidates:
+            # 从最小的集合开始求交集
+            candidates.sort(key=len)
+            ids = candidates[0].intersection(*candidates[1:])
+        else:
+            ids = self.records.keys()
+
+        return sorted((self.records[i] for i in ids), key=lambda r: (r["date"], r["employee"]))
+
+    def top(self, metric="overtime", n=10):
+        """
+        员工排行：metric 为 overtime 时按加班总时长，否则按该状态码出现的天数。
+
+        返回：
+        list: [(员工, 数值), ...]，按数值从大到小
+        """
+        totals = Counter()
+        if metric == "overtime":
+            for record in self.records.values():
+                totals[record["employee"]] += record["overtime_hours"]
+        else:
+            for record_id in self.by_code.get(metric, ()):
+                totals[self.records[record_id]["employee"]] += 1
+        return [(employee, value) for employee, value in totals.most_common(n) if value]
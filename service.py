@@ -0,0 +1,303 @@
+import io
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import openpyxl
+from attendanceManager import AttendanceManager, DETAIL_HEADER
+from exporter import json_default
+from log_config import logger
+from parse import convert_file, convert_upload, filter_times
+from utils import generate_excel_file
+
+# 上传文件大小上限
+MAX_UPLOAD_BYTES = 64 * 1024 * 1024
+# 解析结果缓存的文件数
+FILE_CACHE_SIZE = 32
+# 保留的历史任务数（含结果）
+MAX_JOBS = 256
+# 统计延迟时保留的最近任务数
+LATENCY_WINDOW = 1000
+
+
+def _percentile(values, percent):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class ReportService:
+    """常驻服务：缓存节假日日历和已解析的文件，在有界线程池中执行考勤任务"""
+
+    def __init__(self, workers=None, max_pending=None):
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.max_pending = max_pending or self.workers * 8
+        self.executor = ThreadPoolExecutor(max_workers=self.workers)
+        self.lock = threading.Lock()
+
+        self.jobs = OrderedDict()  # 任务ID -> 任务信息
+        self.managers = {}  # 年份 -> AttendanceManager（含日历）
+        self.file_cache = OrderedDict()  # (路径, 修改时间, 大小) -> convert_file 结果
+
+        self.pending = 0
+        self.counters = {"submitted": 0, "done": 0, "failed": 0, "rejected": 0, "cache_hits": 0, "cache_misses": 0}
+        self.latencies = deque(maxlen=LATENCY_WINDOW)  # 执行耗时
+        self.waits = deque(maxlen=LATENCY_WINDOW)  # 排队耗时
+
+    def get_manager(self, year):
+        """按年份缓存考勤管理器，节假日与调休数据只初始化一次"""
+        with self.lock:
+            if year not in self.managers:
+                self.managers[year] = AttendanceManager(year, is_flexible=True)
+            return self.managers[year]
+
+    def load_file(self, path):
+        """读取本地考勤文件，文件未变化时直接使用缓存的解析结果"""
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            if key in self.file_cache:
+                self.file_cache.move_to_end(key)
+                self.counters["cache_hits"] += 1
+                return self.file_cache[key]
+            self.counters["cache_misses"] += 1
+
+        src_dict = convert_file(path)
+        if src_dict is None:
+            raise ValueError(f"解析失败: {path}")
+
+        with self.lock:
+            self.file_cache[key] = src_dict
+            while len(self.file_cache) > FILE_CACHE_SIZE:
+                self.file_cache.popitem(last=False)
+        return src_dict
+
+    def submit(self, params, content=None):
+        """
+        提交任务。
+
+        参数：
+        params (dict): path（本地文件，上传时可省略）、name（上传文件的原文件名，可省略）、year、month、
+                       tm（默认 3）、format（xlsx/json，默认 xlsx）
+        content (bytes): 上传的考勤文件内容
+
+        返回：
+        dict: 任务信息；排队任务过多时返回 None
+        """
+        if content is None and not params.get("path"):
+            raise ValueError("缺少 path 参数或上传内容")
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": "queued",
+            "path": params.get("path"),
+            "name": params.get("name", ""),
+            "year": int(params["year"]),
+            "month": int(params["month"]),
+            "tm": int(params.get("tm", 3)),
+            "format": params.get("format", "xlsx"),
+            "created": time.time(),
+            "started": None,
+            "finished": None,
+            "error": None,
+            "result": None,
+            "done": threading.Event(),
+        }
+        if job["format"] not in ("xlsx", "json"):
+            raise ValueError(f"不支持的格式: {job['format']}")
+
+        with self.lock:
+            if self.pending >= self.max_pending:
+                self.counters["rejected"] += 1
+                return None
+            self.pending += 1
+            self.counters["submitted"] += 1
+            self.jobs[job["id"]] = job
+            while len(self.jobs) > MAX_JOBS:
+                self.jobs.popitem(last=False)
+
+        self.executor.submit(self._run, job, content)
+        return job
+
+    def _run(self, job, content):
+        job["started"] = time.time()
+        job["status"] = "running"
+        try:
+            src_dict = convert_upload(content, job["name"]) if content is not None else self.load_file(job["path"])
+            filter_dict = filter_times(src_dict, job["year"], job["month"], job["tm"])
+            attendance_manager = self.get_manager(job["year"])
+            result = attendance_manager.process_month(job["month"], filter_dict)
+
+            if job["format"] == "json":
+                job["result"] = json.dumps({
+                    "year": job["year"],
+                    "month": job["month"],
+                    "summary": attendance_manager.summarize(result),
+                    "rows": [dict(zip(DETAIL_HEADER, row)) for row, _ in attendance_manager.iter_detail_rows(result)],
+                }, ensure_ascii=False, default=json_default).encode("utf-8")
+            else:
+                wb = openpyxl.Workbook()
+                generate_excel_file(wb, filter_dict, attendance_manager)
+                attendance_manager.write_attendance_to_excel(wb, result)
+                buffer = io.BytesIO()
+                wb.save(buffer)
+                job["result"] = buffer.getvalue()
+
+            job["status"] = "done"
+        except Exception as e:
+            logger.error(f"任务执行失败,任务:{job['id']},异常:{e}")
+            job["status"] = "failed"
+            job["error"] = str(e)
+        finally:
+            job["finished"] = time.time()
+            with self.lock:
+                self.pending -= 1
+                self.counters[job["status"]] += 1
+                self.latencies.append(job["finished"] - job["started"])
+                self.waits.append(job["started"] - job["created"])
+            job["done"].set()
+
+    def get_job(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def describe(self, job):
+        """任务状态（不含结果内容）"""
+        info = {key: job[key] for key in ("id", "status", "path", "year", "month", "tm", "format", "error")}
+        info["queue_seconds"] = job["started"] - job["created"] if job["started"] else None
+        info["run_seconds"] = job["finished"] - job["started"] if job["finished"] else None
+        return info
+
+    def get_metrics(self):
+        with self.lock:
+            latencies = list(self.latencies)
+            waits = list(self.waits)
+            metrics = dict(self.counters)
+            metrics.update({"workers": self.workers, "pending": self.pending, "cached_files": len(self.file_cache)})
+
+        for name, values in (("run", latencies), ("queue", waits)):
+            metrics[f"{name}_seconds"] = {
+                "count": len(values),
+                "mean": sum(values) / len(values) if values else None,
+                "p50": _percentile(values, 50),
+                "p95": _percentile(values, 95),
+                "max": max(values) if values else None,
+            }
+        return metrics
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
+
+class ReportRequestHandler(BaseHTTPRequestHandler):
+    """
+    接口：
+    POST /jobs?year=&month=[&tm=&format=&wait=1]  请求体为上传的考勤文件
+    POST /jobs  Content-Type: application/json，{"path": ..., "year": ..., "month": ...}
+    GET  /jobs/<id>         任务状态
+    GET  /jobs/<id>/result  任务结果（xlsx 或 json）
+    GET  /metrics           任务计数与延迟统计
+    """
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def _send(self, code, body, content_type="application/json; charset=utf-8", headers=None):
+        if not isinstance(body, bytes):
+            body = json.dumps(body, ensure_ascii=False, default=json_default).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_result(self, job):
+        service = self.server.service
+        if job["status"] == "failed":
+            self._send(500, service.describe(job))
+        elif job["status"] != "done":
+            self._send(202, service.describe(job))
+        elif job["format"] == "json":
+            self._send(200, job["result"])
+        else:
+            self._send(200, job["result"],
+                       "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                       {"Content-Disposition": f'attachment; filename="{job["year"]}-{job["month"]:02d}.xlsx"'})
+
+    def do_GET(self):
+        service = self.server.service
+        parts = [p for p in urlparse(self.path).path.split("/") if p]
+
+        if parts == ["metrics"]:
+            self._send(200, service.get_metrics())
+        elif len(parts) in (2, 3) and parts[0] == "jobs":
+            job = service.get_job(parts[1])
+            if job is None:
+                self._send(404, {"error": "任务不存在"})
+            elif len(parts) == 3 and parts[2] == "result":
+                self._send_result(job)
+            elif len(parts) == 2:
+                self._send(200, service.describe(job))
+            else:
+                self._send(404, {"error": "接口不存在"})
+        else:
+            self._send(404, {"error": "接口不存在"})
+
+    def do_POST(self):
+        service = self.server.service
+        url = urlparse(self.path)
+        if url.path.rstrip("/") != "/jobs":
+            self._send(404, {"error": "接口不存在"})
+            return
+
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_UPLOAD_BYTES:
+            self._send(413, {"error": f"上传内容超过 {MAX_UPLOAD_BYTES} 字节"})
+            return
+        body = self.rfile.read(length)
+
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        content = None
+        try:
+            if self.headers.get("Content-Type", "").startswith("application/json"):
+                data = json.loads(body.decode("utf-8") or "{}")
+                if not isinstance(data, dict):
+                    raise ValueError("JSON 内容必须是对象")
+                params.update(data)
+            else:
+                content = body
+            job = service.submit(params, content)
+        except (KeyError, ValueError, TypeError) as e:  # 如 {"year": null} 在 int() 时抛出 TypeError
+            self._send(400, {"error": f"参数错误: {e}"})
+            return
+
+        if job is None:
+            self._send(503, {"error": "排队任务过多，请稍后重试"})
+        elif str(params.get("wait", "")).lower() in ("1", "true"):
+            # 同步等待结果，便于替换原来循环调用可执行文件的脚本
+            job["done"].wait()
+            self._send_result(job)
+        else:
+            self._send(202, service.describe(job), headers={"Location": f"/jobs/{job['id']}"})
+
+
+def serve(host="127.0.0.1", port=8765, workers=None):
+    """启动本地 HTTP 服务，阻塞直到 Ctrl+C"""
+    server = ThreadingHTTPServer((host, port), ReportRequestHandler)
+    server.service = ReportService(workers)
+    logger.info(f"服务已启动: http://{host}:{port} (工作线程: {server.service.workers})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("服务正在停止...")
+    finally:
+        server.server_close()
+        server.service.shutdown()
@@ -0,0 +1,179 @@
+import os
+import time
+import openpyxl
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from attendanceManager import AttendanceManager
+from checkpoint import Journal, unit_key
+from log_config import get_log_queue, init_worker_logging, logger
+from parse import convert_file, filter_times
+from utils import get_employee_labels, get_output_path
+
+# 支持的分片方式：按员工（可多人一片）或按月份
+SHARD_MODES = ("employee", "month")
+
+# 工作进程内按年份缓存的考勤管理器，避免每个分片重复初始化节假日数据
+_managers = {}
+
+
+def _get_manager(year):
+    if year not in _managers:
+        _managers[year] = AttendanceManager(year, is_flexible=True)
+    return _managers[year]
+
+
+def plan_shards(files, months, mode="employee", shard_size=1):
+    """
+    按分片方式把 (文件, 月份) 单元划分为若干分片。
+
+    参数：
+    files (list): 考勤文件路径，每个文件对应一名员工（标识见 get_employee_labels，不同目录下的同名文件不会重名）
+    months (list): 需要处理的月份
+    mode (str): "employee" 每 shard_size 名员工一个工作簿；"month" 每个月一个工作簿
+    shard_size (int): 按员工分片时每个工作簿包含的员工数
+
+    返回：
+    list: [{"name": 分片名, "units": [(文件, 月份), ...], "labels": {文件: 员工标识}}, ...]
+    """
+    if mode not in SHARD_MODES:
+        raise ValueError(f"不支持的分片方式: {mode}")
+
+    labels = get_employee_labels(files)
+
+    shards = []
+    if mode == "month":
+        for month in months:
+            shards.append({"name": f"{month:02d}", "units": [(f, month) for f in files],
+                           "labels": labels})
+    else:
+        shard_size = max(1, shard_size)
+        for i in range(0, len(files), shard_size):
+            group = files[i:i + shard_size]
+            if len(group) == 1:
+                name = labels[group[0]]
+            else:
+                name = f"{labels[group[0]]}--{labels[group[-1]]}"
+            shards.append({"name": name, "units": [(f, m) for f in group for m in months],
+                           "labels": {f: labels[f] for f in group}})
+    return shards
+
+
+def build_shard(shard, year, threshold_minutes, output_dir):
+    """在工作进程中生成单个分片工作簿，返回该分片的汇总信息"""
+    start = time.perf_counter()
+    attendance_manager = _get_manager(year)
+
+    wb = openpyxl.Workbook()
+    summary = {"天数": 0, "正常": 0, "异常": 0, "加班": 0, "加班时长": 0}
+    employees = set()
+
+    for file_path, month in shard["units"]:
+        employee = shard["labels"][file_path]
+        employees.add(employee)
+
+        src_dict = convert_file(file_path)
+        if src_dict is None:
+            raise ValueError(f"解析失败: {file_path}")
+        filter_dict = filter_times(src_dict, year, month, threshold_minutes)
+        result = attendance_manager.process_month(month, filter_dict)
+
+        # 工作表名不能超过 31 个字符
+        title = f"{employee}-{month:02d}"[-31:]
+        attendance_manager.write_attendance_to_excel(wb, result, title=title)
+
+        for key, value in attendance_manager.summarize(result).items():
+            summary[key] += value
+
+    output_file = os.path.join(output_dir, f"{shard['name']}.xlsx")
+    if os.path.abspath(output_file) in {os.path.abspath(f) for f, _ in shard["units"]}:
+        output_file = get_output_path(output_file)  # 输入本身是同名 xlsx 时不能覆盖
+    wb.save(output_file)
+
+    return {
+        "name": shard["name"],
+        "file": output_file,
+        "employees": len(employees),
+        "months": sorted({m for _, m in shard["units"]}),
+        "summary": summary,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def write_index(shard_infos, output_file):
+    """生成索引工作簿，列出每个分片及其汇总数据"""
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "index"
+
+    ws.append(["分片", "文件", "员工数", "月份", "天数", "正常", "异常", "加班", "加班时长", "耗时(秒)"])
+
+    total = {"天数": 0, "正常": 0, "异常": 0, "加班": 0, "加班时长": 0}
+    for info in shard_infos:
+        summary = info["summary"]
+        ws.append([
+            info["name"], os.path.basename(info["file"]), info["employees"],
+            ",".join(str(m) for m in info["months"]),
+            summary["天数"], summary["正常"], summary["异常"], summary["加班"], summary["加班时长"],
+            round(info["seconds"], 2),
+        ])
+        for key in total:
+            total[key] += summary[key]
+
+    ws.append(["合计", "", "", "", total["天数"], total["正常"], total["异常"], total["加班"], total["加班时长"], ""])
+    wb.save(output_file)
+
+
+def process_sharded(files, year, months, threshold_minutes, mode="employee", shard_size=1,
+                    workers=None, output_dir=".", journal_path=None, resume=False):
+    """
+    分片并行输出：每个分片在独立进程中生成工作簿，最后写出 index.xlsx。
+    指定 journal_path 时每个分片完成后写入检查点，resume 时跳过已完成的分片。
+
+    返回：
+    list: 各分片的汇总信息，按分片顺序排列
+    """
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    shards = plan_shards(files, months, mode, shard_size)
+    logger.info(f"共 {len(files)} 个文件, {len(months)} 个月, 分为 {len(shards)} 个分片")
+
+    journal = Journal(journal_path, resume) if journal_path else None
+    shard_infos = {}
+    units = {}
+    pending = []
+    for shard in shards:
+        files_in_shard = sorted({f for f, _ in shard["units"]})
+        months_in_shard = sorted({m for _, m in shard["units"]})
+        units[shard["name"]] = unit_key(files_in_shard, year, months_in_shard, threshold_minutes, f"shard={shard['name']}")
+        if journal and journal.is_done(units[shard["name"]]):
+            shard_infos[shard["name"]] = journal.get(units[shard["name"]])["info"]
+        else:
+            pending.append(shard)
+    if len(pending) < len(shards):
+        logger.info(f"跳过已完成的分片 {len(shards) - len(pending)} 个")
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker_logging,
+                             initargs=(get_log_queue(),)) as executor:
+        futures = {
+            executor.submit(build_shard, shard, year, threshold_minutes, output_dir): shard["name"]
+            for shard in pending
+        }
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                info = future.result()
+            except Exception as e:
+                logger.error(f"分片生成失败,分片:{name},异常:{e}")
+                if journal:
+                    journal.record_failed(units[name], e)
+                continue
+            shard_infos[name] = info
+            if journal:
+                journal.record_done(units[name], [info["file"]], info)
+            logger.info(f"分片已保存为：{info['file']}")
+
+    ordered = [shard_infos[s["name"]] for s in shards if s["name"] in shard_infos]
+    index_file = os.path.join(output_dir, "index.xlsx")
+    write_index(ordered, index_file)
+    logger.info(f"索引已保存为：{index_file}")
+    return ordered
@@ -0,0 +1,139 @@
+import datetime
+import openpyxl
+from datetime import timedelta
+from openpyxl.styles import PatternFill
+from attendanceManager import AttendanceManager
+from log_config import logger
+from parse import convert_file, _filter_day
+
+
+def variant_name(threshold_minutes, is_flexible):
+    return f"tm={threshold_minutes},{'弹性' if is_flexible else '固定'}"
+
+
+def _cell_text(status, data):
+    """对比表中的单元格：状态，有加班时长时附上时长"""
+    hours = getattr(data, "overtime_hours", 0)
+    return f"{status}({hours}h)" if hours else status
+
+
+def run_sweep(src_dict, year, month, thresholds, flexible_options=(True, False)):
+    """
+    一次解析、多组参数：在同一份已排序的打卡数据上评估多个过滤阈值及弹性/固定两种规则。
+
+    各组参数共享的工作只做一次：打卡字符串只解析排序一次，日期类型只判断一次；
+    过滤结果相同的日期直接复用分类结果，非工作日的分类与弹性设置无关，两种规则共用。
+
+    参数：
+    src_dict (dict): convert_file 的结果 {日期: [打卡时间字符串]}
+    thresholds (list): 过滤阈值（分钟）列表
+    flexible_options (tuple): 需要评估的弹性设置
+
+    返回：
+    tuple: (variants, results)，variants 为 [(阈值, 是否弹性), ...]，
+           results 为 {variant: {日期: 考勤结果}}，与 process_month 的结果相同
+    """
+    managers = {flexible: AttendanceManager(year, is_flexible=flexible) for flexible in flexible_options}
+
+    # 该月每天的日期与类型，所有参数组合共用
+    context = managers[flexible_options[0]].get_month_context(month)
+    month_days = list(zip(context.date_strs, context.dates, context.day_types))
+
+    # 只解析排序一次
+    month_prefix = f"{year:04d}-{month:02d}-"
+    parsed = {
+        date_str: sorted(datetime.datetime.strptime(t, "%Y-%m-%d %H:%M:%S") for t in times)
+        for date_str, times in src_dict.items() if date_str.startswith(month_prefix)
+    }
+
+    variants = [(tm, flexible) for tm in thresholds for flexible in flexible_options]
+    results = {variant: {} for variant in variants}
+    cache = {}  # (日期, 过滤后的打卡, 弹性设置) -> 考勤结果
+    for tm in thresholds:
+        threshold = timedelta(minutes=tm)
+        filtered = {date_str: tuple(_filter_day(times, threshold)) for date_str, times in parsed.items()}
+
+        for flexible in flexible_options:
+            manager = managers[flexible]
+            result = results[(tm, flexible)]
+            for date_str, date, day_type in month_days:
+                punches = filtered.get(date_str)
+                if punches is None:
+                    result[date_str] = "缺勤" if day_type == "workday" else "非工作日"
+                    continue
+
+                key = (date_str, punches, flexible if day_type == "workday" else None)
+                if key not in cache:
+                    if day_type == "workday":
+                        cache[key] = manager.handle_workday(date, list(punches))
+                    elif day_type == "restday":
+                        cache[key] = manager.handle_restday(list(punches))
+                    elif day_type == "holiday":
+                        cache[key] = manager.handle_holiday(list(punches))
+                    else:
+                        cache[key] = "日期类型未知"
+                result[date_str] = cache[key]
+
+    return variants, results
+
+
+def write_sweep_excel(wb, year, variants, results):
+    """
+    写出参数对比表：sweep 表逐日列出各组参数的状态，与第一组结果不同的日期标黄；
+    summary 表列出各组参数的汇总及与第一组不同的天数。
+    """
+    if 'Sheet' in wb.sheetnames:
+        del wb['Sheet']
+
+    names = [variant_name(*variant) for variant in variants]
+    baseline = results[variants[0]]
+    manager = AttendanceManager(year)
+    first = next(iter(baseline))
+    context = manager.get_month_context(int(first[5:7]), int(first[:4]))
+    yellow_fill = PatternFill(start_color="FFFF00", end_color="FFFF00", fill_type="solid")
+
+    ws = wb.create_sheet(title="sweep")
+    ws.append(["日期", "星期", "类型"] + names + ["差异"])
+
+    changed = {variant: 0 for variant in variants}
+    for date_str in baseline:
+        cells = []
+        for variant in variants:
+            data = results[variant][date_str]
+            cells.append(_cell_text(AttendanceManager.get_status(data), data))
+        differs = [variant for variant, cell in zip(variants, cells) if cell != cells[0]]
+        for variant in differs:
+            changed[variant] += 1
+
+        i = context.index[date_str]
+        ws.append([date_str, context.weekdays[i], context.day_type_labels[i]] + cells + ["是" if differs else ""])
+        if differs:
+            for i in range(1, len(names) + 5):
+                ws.cell(row=ws.max_row, column=i).fill = yellow_fill
+
+    ws = wb.create_sheet(title="summary")
+    ws.append(["参数", "天数", "正常", "异常", "加班", "加班时长", f"与 {names[0]} 不同的天数"])
+    for variant, name in zip(variants, names):
+        summary = manager.summarize(results[variant])
+        ws.append([name, summary["天数"], summary["正常"], summary["异常"], summary["加班"], summary["加班时长"],
+                   changed[variant]])
+
+    for sheet in (wb["sweep"], ws):
+        for col in sheet.columns:
+            width = max(len(str(cell.value)) if cell.value is not None else 0 for cell in col)
+            sheet.column_dimensions[col[0].column_letter].width = width + 4
+
+
+def process_sweep(file_path, year, month, thresholds, output_file):
+    """解析一次考勤文件，按多组参数评估并写出对比工作簿"""
+    src_dict = convert_file(file_path)
+    if src_dict is None:
+        raise ValueError(f"解析失败: {file_path}")
+
+    variants, results = run_sweep(src_dict, year, month, thresholds)
+
+    wb = openpyxl.Workbook()
+    write_sweep_excel(wb, year, variants, results)
+    wb.save(output_file)
+    logger.info(f"参数对比已保存为：{output_file}")
+    return results
@@ -0,0 +1,78 @@
+import gzip
+import io
+import os
+import sys
+import zipfile
+from datetime import datetime, time
+
+import openpyxl
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parse import convert_file, convert_upload, iter_punches
+
+
+def _write_xlsx(path, rows):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    for row in rows:
+        ws.append(row)
+    wb.save(path)
+
+
+def test_xlsx_date_and_time_columns(tmp_path):
+    """日期列与时间列分开存储（原生日期、时间单元格）时，拼成完整的打卡时间"""
+    path = str(tmp_path / "emp.xlsx")
+    _write_xlsx(path, [
+        ["工号", "日期", "时间"],
+        ["001", datetime(2025, 2, 3), time(8, 1, 2)],
+        ["001", datetime(2025, 2, 3), time(18, 30, 0)],
+    ])
+
+    assert list(iter_punches(path)) == ["2025-02-03 08:01:02", "2025-02-03 18:30:00"]
+    assert convert_file(path) == {"2025-02-03": ["2025-02-03 08:01:02", "2025-02-03 18:30:00"]}
+
+
+def test_xlsx_datetime_column(tmp_path):
+    """单列的日期时间（含零点打卡）保持原样"""
+    path = str(tmp_path / "emp.xlsx")
+    _write_xlsx(path, [
+        ["001", datetime(2025, 2, 3, 8, 1, 2)],
+        ["001", datetime(2025, 2, 4, 0, 0, 0)],
+    ])
+
+    assert list(iter_punches(path)) == ["2025-02-03 08:01:02", "2025-02-04 00:00:00"]
+
+
+def _xlsx_bytes(rows):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    for row in rows:
+        ws.append(row)
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+EXPECTED = {"2025-02-03": ["2025-02-03 08:01:02", "2025-02-03 18:30:00"]}
+CSV_CONTENT = "工号,日期,时间\n001,2025-02-03,08:01:02\n001,2025-02-03,18:30:00\n".encode("gbk")
+
+
+def test_upload_csv_date_and_time_columns():
+    """上传内容没有文件名时按内容识别格式，CSV 的日期与时间分列也能解析"""
+    assert convert_upload(CSV_CONTENT) == EXPECTED
+
+
+def test_upload_archives_and_xlsx():
+    """上传的 .gz/.zip/xlsx 与本地文件使用相同的读取方式"""
+    zip_buffer = io.BytesIO()
+    with zipfile.ZipFile(zip_buffer, "w") as archive:
+        archive.writestr("emp.csv", CSV_CONTENT)
+    xlsx = _xlsx_bytes([["001", datetime(2025, 2, 3), time(8, 1, 2)],
+                        ["001", datetime(2025, 2, 3), time(18, 30, 0)]])
+
+    assert convert_upload(gzip.compress(CSV_CONTENT)) == EXPECTED
+    assert convert_upload(gzip.compress(CSV_CONTENT), "emp.csv.gz") == EXPECTED
+    assert convert_upload(zip_buffer.getvalue()) == EXPECTED
+    assert convert_upload(xlsx) == EXPECTED
+    assert convert_upload(xlsx, "emp.xlsx") == EXPECTED
@@ -1,4 +1,8 @@
 ﻿from log_config import logger
+from attendanceManager import get_weekday_chinese
+from collections import Counter
+from datetime import datetime
+import gzip
 import json
 import os
 
@@ -18,7 +22,226 @@ def save_debug_data(attendance_data, dir, name):
         with open(json_file_path, 'w', encoding='utf-8') as json_file:
             json.dump(attendance_data, json_file, ensure_ascii=False, indent=4)
 
-        logger.debug(f"Debug data saved to: {json_file_path}")
+        logger.debug("Debug data saved to: %s", json_file_path)
 
     except Exception as e:
-        logger.error(f"保存调试数据出错,异常:{e}")
\ No newline at end of file
+        logger.error(f"保存调试数据出错,异常:{e}")
+
+
+class DebugSnapshot:
+    """
+    调试快照：每次运行写入独立目录 debug/<时间>-<进程号>/，各阶段数据按日期排序后
+    以 gzip 压缩的 JSONL 流式写出（每行一天），可只抽样部分日期或员工，并生成阶段间的差异。
+    """
+
+    def __init__(self, base_dir, dates=None, employees=None):
+        self.run_dir = os.path.join(base_dir, 'debug', f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.getpid()}")
+        self.dates = set(dates) if dates else None
+        self.employees = set(employees) if employees else None
+        self.stages = {}  # (员工, 阶段) -> 文件路径
+
+    def _path(self, employee, name):
+        prefix = f"{employee}." if employee else ""
+        return os.path.join(self.run_dir, f"{prefix}{name}.jsonl.gz")
+
+    def _selected(self, employee):
+        return self.employees is None or employee in self.employees
+
+    def save(self, attendance_data, stage, employee=None):
+        """写出一个阶段的数据 {日期: [打卡时间, ...]}，返回文件路径；未被抽样选中时返回 None"""
+        if not self._selected(employee):
+            return None
+        try:
+            if not os.path.exists(self.run_dir):
+                os.makedirs(self.run_dir)
+
+            path = self._path(employee, stage)
+            with gzip.open(path, 'wt', encoding='utf-8') as file:
+                for date in sorted(attendance_data.keys()):
+                    if self.dates is not None and date not in self.dates:
+                        continue
+                    file.write(json.dumps({"date": date, "punches": attendance_data[date]},
+                                          ensure_ascii=False, separators=(',', ':')))
+                    file.write("\n")
+
+            self.stages[(employee, stage)] = path
+            logger.debug("Debug snapshot saved to: %s", path)
+            return path
+
+        except Exception as e:
+            logger.error(f"保存调试快照出错,异常:{e}")
+
+    def diff(self, stage_a, stage_b, employee=None):
+        """
+        比较两个已保存的阶段，按日期写出差异：removed/added 为两阶段间减少/增加的打卡，
+        dropped 为后一阶段整天不存在（如 filter 去掉的其他月份）的打卡数。
+        """
+        if (employee, stage_a) not in self.stages or (employee, stage_b) not in self.stages:
+            return None
+        try:
+            path = self._path(employee, f"{stage_a}-{stage_b}.diff")
+            with gzip.open(self.stages[(employee, stage_a)], 'rt', encoding='utf-8') as file_a, \
+                    gzip.open(self.stages[(employee, stage_b)], 'rt', encoding='utf-8') as file_b, \
+                    gzip.open(path, 'wt', encoding='utf-8') as out:
+                # 两个文件都按日期排序，逐行归并比较，不需要整体读入内存
+                records_b = (json.loads(line) for line in file_b)
+                record_b = next(records_b, None)
+                for line in file_a:
+                    record_a = json.loads(line)
+                    date = record_a["date"]
+                    while record_b is not None and record_b["date"] < date:
+                        out.write(json.dumps({"date": record_b["date"], "added": record_b["punches"]},
+                                             ensure_ascii=False, separators=(',', ':')) + "\n")
+                        record_b = next(records_b, None)
+
+                    if record_b is None or record_b["date"] != date:
+                        change = {"date": date, "dropped": len(record_a["punches"])}
+                    else:
+                        count_a, count_b = Counter(record_a["punches"]), Counter(record_b["punches"])
+                        change = {"date": date,
+                                  "removed": sorted((count_a - count_b).elements()),
+                                  "added": sorted((count_b - count_a).elements())}
+                        record_b = next(records_b, None)
+                        if not change["removed"] and not change["added"]:
+                            continue
+                    out.write(json.dumps(change, ensure_ascii=False, separators=(',', ':')) + "\n")
+
+                while record_b is not None:
+                    out.write(json.dumps({"date": record_b["date"], "added": record_b["punches"]},
+                                         ensure_ascii=False, separators=(',', ':')) + "\n")
+                    record_b = next(records_b, None)
+            return path
+
+        except Exception as e:
+            logger.error(f"生成调试差异出错,异常:{e}")
+
+
+# src 表表头
+SRC_HEADER = ["日期", "星期", "打卡时间1", "打卡时间2", "打卡时间3", "打卡时间4"]  # 可根据最大打卡次数调整
+
+
+def iter_src_rows(final_attendance_data, attendance_manager=None):
+    """
+    按日期顺序逐行产出 src 表数据：日期、星期及当天各次打卡的时分秒。
+    传入 attendance_manager 时星期取自其共用的 MonthContext，不再逐行解析日期。
+    """
+    contexts = {}  # "YYYY-MM" -> MonthContext
+    # 遍历最终考勤数据
+    sorted_dates = sorted(final_attendance_data.keys())
+    for date in sorted_dates:
+        if attendance_manager is None:
+            weekday = get_weekday_chinese(date)
+        else:
+            context = contexts.get(date[:7])
+            if context is None:
+                context = contexts[date[:7]] = attendance_manager.get_month_context(int(date[5:7]), int(date[:4]))
+            weekday = context.weekdays[context.index[date]]
+        formatted_times = [time.split(" ")[1] for time in final_attendance_data[date]]  # 取出时分秒部分
+
+        # 将同一天的打卡时间写入同一行，每个时间占据一个单元格
+        row = [date, weekday] + formatted_times
+
+        # 补齐空白单元格以保证每一行的列数一致（假设最多有5次打卡）
+        while len(row) < 7:  # 确保每行至少有6列（日期、星期及5个打卡时间）
+            row.append('')
+
+        yield row
+
+
+# 生成并保存 Excel 文件
+def generate_excel_file(wb, final_attendance_data, attendance_manager=None):
+    # 删除默认的工作表
+    if 'Sheet' in wb.sheetnames:
+        del wb['Sheet']
+
+    # 创建一个工作表名为 "src"
+    ws = wb.create_sheet(title="src")
+
+    # 写入表头
+    ws.append(SRC_HEADER)
+
+    for row in iter_src_rows(final_attendance_data, attendance_manager):
+        ws.append(row)
+
+
+def _strip_ext(file_path):
+    """去掉扩展名，压缩文件（如 a.txt.gz）连同内层扩展名一起去掉"""
+    base, ext = os.path.splitext(file_path)
+    if ext.lower() == ".gz":
+        base, ext = os.path.splitext(base)
+    return base, ext
+
+
+def get_employee_name(file_path):
+    """以考勤文件名（不含扩展名）作为员工标识"""
+    return _strip_ext(os.path.basename(file_path))[0]
+
+
+def get_employee_labels(files):
+    """
+    为一批考勤文件生成互不重复的员工标识：默认为文件名；不同目录下有同名文件时，
+    改用相对于这些文件公共目录的路径，目录之间以 "-" 连接（如 teamA/emp.txt -> teamA-emp）。
+
+    返回：
+    dict: {文件路径: 员工标识}
+
+    异常：
+    ValueError: 仍有重复的标识（如同一目录下的 emp.txt 与 emp.csv）
+    """
+    names = {f: get_employee_name(f) for f in files}
+    counts = Counter(names.values())
+    if all(count == 1 for count in counts.values()):
+        return names
+
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(f)) for f in files])
+    labels = {}
+    for f, name in names.items():
+        if counts[name] > 1:
+            relative = _strip_ext(os.path.relpath(os.path.abspath(f), root))[0]
+            name = "-".join(relative.split(os.sep))
+        labels[f] = name
+
+    duplicates = sorted(name for name, count in Counter(labels.values()).items() if count > 1)
+    if duplicates:
+        raise ValueError(f"员工标识重复，无法区分输出: {', '.join(duplicates)}")
+    return labels
+
+
+def get_output_path(file_path):
+    """输出工作簿路径：与考勤文件同名的 .xlsx；输入本身是 .xlsx 时加 .result 后缀，避免覆盖"""
+    base, ext = _strip_ext(file_path)
+    if ext.lower() == ".xlsx":
+        base += ".result"
+    return base + ".xlsx"
+
+
+def expand_inputs(path, exts=(".txt",)):
+    """展开输入路径：目录则递归返回其中的考勤文件（按路径排序），否则原样返回"""
+    if not os.path.isdir(path):
+        return [path]
+
+    files = []
+    for root, _, names in os.walk(path):
+        for name in names:
+            if os.path.splitext(name)[1].lower() in exts:
+                files.append(os.path.join(root, name))
+    return sorted(files)
+
+
+def parse_months(text):
+    """解析月份列表，支持 "1-3,5" 这样的写法，返回去重排序后的月份"""
+    months = set()
+    for part in text.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            start, end = part.split("-", 1)
+            months.update(range(int(start), int(end) + 1))
+        else:
+            months.add(int(part))
+
+    for month in months:
+        if not 1 <= month <= 12:
+            raise ValueError(f"月份无效: {month}")
+    return sorted(months)